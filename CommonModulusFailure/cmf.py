@@ -1,3 +1,12 @@
+import os
+import sys
+
+MODULAR_ARITHMETIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ModularArithmetic')
+sys.path.append(os.path.join(MODULAR_ARITHMETIC_DIR, 'EsponenziazioneVeloce'))
+sys.path.append(os.path.join(MODULAR_ARITHMETIC_DIR, 'ExtendedEuclid'))
+from modexp import multi_pow
+from egcd import egcd
+
 
 # rsa modulus
 n = 1309914994772590863210166992356557234456075980579048604758768205496404269677841156459642052158879494989630338961154043468325508153199153204245943547981
@@ -19,31 +28,13 @@ c2 = 411294544478239271886338859092185183748200324266700081787109375
 
 
 # calcolare x, y
-def egcd(a, b):
-    x = 0    
-    u = 1    
-    y = 1
-    v = 0    
-    while a != 0:
-        q = b // a
-        r = b % a
-        s = x - q * u
-        t = y - q * v
-        b = a
-        a = r
-        x = u
-        y = v
-        u = s
-        v = t
-    gcd = b
-    return gcd, x, y
-    
 g, x, y = egcd(e1, e2)
 print("Computed g, x, y: ", g, x, y)
 
 # calcolare m
 
-m = pow(c1, x, n) * pow(c2, y, n) % n
+# c1^x * c2^y mod n con una sola catena di quadrati (uno dei due esponenti è negativo)
+m = multi_pow([c1, c2], [x, y], n)
 print("Decrypted message: ", m)
 
 
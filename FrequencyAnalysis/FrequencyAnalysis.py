@@ -2,7 +2,6 @@ import argparse
 import json
 import math
 from collections import Counter
-import matplotlib.pyplot as plt
 import os
 import string
 
@@ -27,6 +26,8 @@ def letter_frequency_histogram(text, output_path):
     for l in letter_frequencies:
         print("Letter: ", l[0], "Frequency: ", l[1])
 
+    # matplotlib takes long to import and is only needed to plot
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(10, 6))
     plt.bar(letters, frequencies, color='plum')
     plt.xlabel('Letters')
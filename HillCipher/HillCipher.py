@@ -1,7 +1,6 @@
 import argparse
 import math
 import string
-from sympy import Matrix as sympy_matrix
 import numpy as np
 
 # Message representation
@@ -69,6 +68,8 @@ def get_inverse(matrix, N):
     det = int(np.round(np.linalg.det(matrix))) % N   
     # check coprimality of det and N   
     if np.gcd(det, N) == 1:
+        # sympy takes long to import and is only needed here
+        from sympy import Matrix as sympy_matrix
         matrix = sympy_matrix(matrix)
         return np.matrix(matrix.inv_mod(N))
     else:
@@ -0,0 +1,70 @@
+# Bit-level I/O: codes are written and read as (value, length) pairs, the most
+# significant bit first, and packed 8 bits per byte. The last byte is padded
+# with zeros, so the number of bits must be stored next to the bytes.
+
+class BitWriter:
+    def __init__(self):
+        self.buffer = bytearray()
+        self.accumulator = 0
+        self.pending_bits = 0   # bits in the accumulator, not yet in the buffer
+        self.nr_bits = 0        # bits written in total
+
+    def write(self, value, length):
+        self.accumulator = (self.accumulator << length) | value
+        self.pending_bits += length
+        self.nr_bits += length
+        if self.pending_bits >= 64:
+            # move the whole bytes to the buffer, keep the last pending_bits % 8 bits
+            extra = self.pending_bits & 7
+            self.buffer += (self.accumulator >> extra).to_bytes(self.pending_bits >> 3, 'big')
+            self.accumulator &= (1 << extra) - 1
+            self.pending_bits = extra
+
+    def write_bits(self, bits):
+        # bits is a string of '0' and '1'
+        if bits:
+            self.write(int(bits, 2), len(bits))
+
+    def getvalue(self):
+        padding = -self.pending_bits & 7
+        tail = (self.accumulator << padding).to_bytes((self.pending_bits + padding) >> 3, 'big')
+        return bytes(self.buffer) + tail
+
+
+class BitReader:
+    def __init__(self, data, nr_bits=None, offset=0):
+        # data[offset:] holds nr_bits bits (by default all of them)
+        self.data = data
+        self.position = offset * 8
+        self.end = self.position + (nr_bits if nr_bits is not None else len(data) * 8 - self.position)
+        if self.end > len(data) * 8:
+            raise ValueError("Not enough data for the number of bits")
+
+    def remaining(self):
+        return self.end - self.position
+
+    def read(self, length):
+        if length > self.end - self.position:
+            raise ValueError("Read past the end of the bit stream")
+        start = self.position >> 3
+        stop = (self.position + length + 7) >> 3
+        chunk = int.from_bytes(self.data[start:stop], 'big')
+        self.position += length
+        return (chunk >> (stop * 8 - self.position)) & ((1 << length) - 1)
+
+    def read_bit(self):
+        if self.position >= self.end:
+            raise ValueError("Read past the end of the bit stream")
+        bit = (self.data[self.position >> 3] >> (7 - (self.position & 7))) & 1
+        self.position += 1
+        return bit
+
+
+class PackedBits:
+    # bits already packed in bytes, usable where a BitWriter is expected
+    def __init__(self, data, nr_bits):
+        self.data = data
+        self.nr_bits = nr_bits
+
+    def getvalue(self):
+        return self.data
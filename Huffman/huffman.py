@@ -1,6 +1,45 @@
 import argparse
+import bisect
+import functools
 import heapq 
+import os
 import string
+import struct
+import time
+from collections import Counter
+
+from bitio import BitReader, BitWriter, PackedBits
+
+# Binary container of an encoded message (integers big-endian):
+#   magic        4 bytes   b"HUF1"
+#   count        uint32    number of symbols in the code table
+#   code table   for every symbol: uint8 length of the symbol in UTF-8, uint16
+#                length of its code in bits, the symbol, the code packed in bytes
+#   bit count    uint64    number of bits of the payload
+#   payload      the codes of the message, 8 bits per byte, zero padded
+# With a canonical code only the code lengths are stored, the codes are
+# rebuilt from them (canonical_codes):
+#   magic        4 bytes   b"HUF2"
+#   count        uint32    number of symbols
+#   lengths      count * uint8, code length of every symbol
+#   symbols      uint8 flags: if 1 every symbol is one character and the
+#                symbols follow as one UTF-8 string (uint32 length + bytes),
+#                otherwise every symbol is a uint8 length + its UTF-8 bytes
+#   bit count, payload as above
+MAGIC = b"HUF1"
+CANONICAL_MAGIC = b"HUF2"
+HEADER = struct.Struct(">4sI")
+SYMBOL = struct.Struct(">BH")
+BIT_COUNT = struct.Struct(">Q")
+LENGTH = struct.Struct(">B")
+TEXT_LENGTH = struct.Struct(">I")
+
+# longest code written by encode_bytes, so that the decoding tables stay small
+MAX_CODE_LENGTH = 15
+
+# messages of at least this many characters are encoded with numpy
+# (huffman_bulk.py) when it is installed and every symbol is one character
+BULK_THRESHOLD = 4096
 
 class node: 
     def __init__(self, probability, symbol, left=None, right=None): 
@@ -27,8 +66,6 @@ def walk_root(root):
         if node.left:
             stack.append((node.left, new_code))
 
-    is_valid = is_prefix_free(huffman_codes)
-    # print("Is prefix-free: ", is_valid)
     return huffman_codes
 
 def create_huffman_codes(symbols, probabilities):
@@ -52,7 +89,79 @@ def create_huffman_codes(symbols, probabilities):
     return walk_root(nodes[0])
 
 
+def code_lengths(code):
+    # a single symbol gets a one-bit code instead of the empty one
+    return {symbol: max(len(value), 1) for symbol, value in code.items()}
+
+def canonical_codes(symbols, lengths):
+    # Canonical code from the code lengths, in linear time: the codes of each
+    # length are consecutive integers, assigned to the symbols in their order,
+    # and the first code of a length follows the last code of the length before
+    max_length = max(lengths)
+    counts = [0] * (max_length + 1)
+    for length in lengths:
+        counts[length] += 1
+    next_code = [0] * (max_length + 1)
+    value = 0
+    for length in range(1, max_length + 1):
+        value = (value + counts[length - 1]) << 1
+        next_code[length] = value
+    code = {}
+    for symbol, length in zip(symbols, lengths):
+        value = next_code[length]
+        if value >> length:
+            raise ValueError("The code lengths do not describe a prefix-free code")
+        next_code[length] = value + 1
+        code[symbol] = format(value, f'0{length}b')
+    return code
+
+def package_merge_lengths(probabilities, max_length):
+    # Optimal code lengths of at most max_length bits (package-merge).
+    # Every level is the list of the symbols merged, by weight, with the
+    # packages (pairs) of the level below; the 2n - 2 lightest items of the last
+    # level are chosen and the length of a symbol is the number of chosen items
+    # that contain it. A package keeps its two items, so the lengths are
+    # counted by expanding the chosen items: O(n * max_length) time and memory.
+    n = len(probabilities)
+    if n == 1:
+        return [1]
+    if n > (1 << max_length):
+        raise ValueError(f"{n} symbols do not fit in codes of at most {max_length} bits")
+    leaves = sorted((probability, i) for i, probability in enumerate(probabilities))
+    items = leaves
+    for _ in range(max_length - 1):
+        packages = [(items[k][0] + items[k + 1][0], (items[k], items[k + 1])) for k in range(0, len(items) - 1, 2)]
+        items = list(heapq.merge(leaves, packages, key=lambda item: item[0]))
+    lengths = [0] * n
+    stack = items[:2 * n - 2]
+    while stack:
+        content = stack.pop()[1]
+        if isinstance(content, int):
+            lengths[content] += 1
+        else:
+            stack.extend(content)
+    return lengths
+
+def create_canonical_huffman_codes(symbols, probabilities, max_length=None):
+    # canonical code with the Huffman code lengths, or with the optimal lengths
+    # of at most max_length bits
+    if max_length is not None:
+        return canonical_codes(symbols, package_merge_lengths(probabilities, max_length))
+    lengths = code_lengths(create_huffman_codes(symbols, probabilities))
+    return canonical_codes(symbols, [lengths[symbol] for symbol in symbols])
+
 def is_prefix_free(code):
+    # In lexicographic order a code and any code starting with it are adjacent
+    # (every string in between starts with it too), so it is enough to compare
+    # neighbours: O(n log n) comparisons instead of all the pairs
+    sorted_codes = sorted(code.values())
+    for i in range(len(sorted_codes) - 1):
+        if sorted_codes[i + 1].startswith(sorted_codes[i]):
+            return False
+    return True
+
+def is_prefix_free_pairwise(code):
+    # the O(n^2) check, kept for comparison
     sorted_codes = sorted(code.values(), key=len)
     for i in range(len(sorted_codes)):
         for j in range(i + 1, len(sorted_codes)):
@@ -60,7 +169,9 @@ def is_prefix_free(code):
                 return False
     return True
 
-def decode(code, encoded_string):
+def decode_startswith(code, encoded_string):
+    # Symbol by symbol: try every code with startswith, then slice the rest of
+    # the string. O(len * alphabet) with quadratic copying, kept for comparison.
     if not is_prefix_free(code):
         raise ValueError("The provided code is not prefix-free.")
     
@@ -70,19 +181,435 @@ def decode(code, encoded_string):
             if encoded_string.startswith(value):
                 decoded_string += symbol
                 encoded_string = encoded_string[len(value):]
+                break
+        else:
+            raise ValueError("The encoded message ends with an incomplete or invalid code")
     return decoded_string
 
-def encode(characters, probabilities, message):
-        
-    if not (len(characters) == len(probabilities)):
-        raise ValueError("Length of characters and probabilities must be equal: len(characters) = ", len(characters), "len(probabilities) = ", len(probabilities))
-    huffman_code = create_huffman_codes(characters, probabilities)
-    # print(huffman_code)
-    encoded_message = ''
-    stripped_message = message.translate(str.maketrans('', '', string.punctuation)).replace(' ', '').replace("\n", '').lower()
-    for char in stripped_message:
-        encoded_message += huffman_code[char]
-    return encoded_message
+class TableDecoder:
+    # Table-driven decoder for any prefix-free code.
+    # The codes are sorted as left-aligned max_length-bit values: in this
+    # (canonical) order every code owns the interval of windows that start with
+    # it, and the intervals do not overlap. A table indexed by the next
+    # table_bits bits gives the symbol and the length of every code of at most
+    # table_bits bits in one step; longer codes are found by bisection on the
+    # interval starts.
+    LONG = -1       # table entry: the code is longer than table_bits
+    INVALID = 0     # table entry: no code starts with these bits
+
+    def __init__(self, code, table_bits=10):
+        if not is_prefix_free(code):
+            raise ValueError("The provided code is not prefix-free.")
+        if not code or (len(code) > 1 and min(len(value) for value in code.values()) == 0):
+            raise ValueError("Every code must have at least one bit")
+        # a one-symbol alphabet may have the empty code: only zero bits decode (to '')
+        self.max_length = max(len(value) for value in code.values())
+        self.table_bits = min(table_bits, self.max_length)
+        intervals = sorted((int(value or '0', 2) << (self.max_length - len(value)), len(value), symbol) for symbol, value in code.items())
+        self.starts = [start for start, _, _ in intervals]
+        self.interval_lengths = [length for _, length, _ in intervals]
+        self.interval_symbols = [symbol for _, _, symbol in intervals]
+
+        size = 1 << self.table_bits
+        self.symbols = [None] * size
+        self.lengths = [self.INVALID] * size
+        shift = self.max_length - self.table_bits
+        for start, length, symbol in intervals:
+            first = start >> shift
+            if length <= self.table_bits:
+                last = first + (1 << (self.table_bits - length))
+                self.symbols[first:last] = [symbol] * (last - first)
+                self.lengths[first:last] = [length] * (last - first)
+            else:
+                self.lengths[first] = self.LONG
+
+    def _decode_long(self, window):
+        # window: the next max_length bits
+        i = bisect.bisect_right(self.starts, window) - 1
+        if i < 0 or window >= self.starts[i] + (1 << (self.max_length - self.interval_lengths[i])):
+            return None, self.INVALID
+        return self.interval_symbols[i], self.interval_lengths[i]
+
+    def decode_bytes(self, data, nr_bits, offset=0):
+        # decode nr_bits bits of data, starting from bit offset
+        if not self.max_length:
+            if nr_bits:
+                raise ValueError("Invalid code in the encoded message")
+            return ''
+        symbols, lengths = self.symbols, self.lengths
+        table_bits, max_length = self.table_bits, self.max_length
+        table_mask = (1 << table_bits) - 1
+        position = offset >> 3
+        buffer = int.from_bytes(data[position:position + 1], 'big') & (0xFF >> (offset & 7))
+        buffered = 8 - (offset & 7)
+        position += 1
+        remaining = nr_bits
+        decoded = []
+        append = decoded.append
+        while remaining > 0:
+            if buffered < max_length:
+                # refill 8 bytes at a time (zeros past the end of data), keep only the unread bits
+                buffer &= (1 << buffered) - 1
+                while buffered < max_length:
+                    buffer = (buffer << 64) | int.from_bytes(data[position:position + 8].ljust(8, b'\x00'), 'big')
+                    buffered += 64
+                    position += 8
+            index = (buffer >> (buffered - table_bits)) & table_mask
+            length = lengths[index]
+            if length > 0:
+                symbol = symbols[index]
+            else:
+                symbol, length = self._decode_long((buffer >> (buffered - max_length)) & ((1 << max_length) - 1))
+                if length == self.INVALID:
+                    raise ValueError("Invalid code in the encoded message")
+            if length > remaining:
+                raise ValueError("The encoded message ends with an incomplete code")
+            append(symbol)
+            buffered -= length
+            remaining -= length
+        return ''.join(decoded)
+
+    def decode(self, encoded_string):
+        # encoded_string: a string of '0' and '1'
+        if not encoded_string:
+            return ''
+        nr_bits = len(encoded_string)
+        padding = -nr_bits & 7
+        data = (int(encoded_string, 2) << padding).to_bytes((nr_bits + padding) >> 3, 'big')
+        return self.decode_bytes(data, nr_bits)
+
+def decode(code, encoded_string):
+    # code: a symbol -> bit string dict or a HuffmanModel
+    if isinstance(code, HuffmanModel):
+        return code.decode(encoded_string)
+    return TableDecoder(code).decode(encoded_string)
+
+class HuffmanModel:
+    # A code built once from (symbols, probabilities), with the tables that
+    # encoding and decoding need. Models are shared through get_model, so they
+    # must not be modified after construction.
+    __slots__ = ("symbols", "probabilities", "canonical", "max_length", "code", "codes", "_decoder", "_bulk")
+
+    def __init__(self, symbols, probabilities, canonical=False, max_length=None):
+        if not (len(symbols) == len(probabilities)):
+            raise ValueError("Length of characters and probabilities must be equal: len(characters) = ", len(symbols), "len(probabilities) = ", len(probabilities))
+        self.symbols = tuple(symbols)
+        self.probabilities = tuple(probabilities)
+        self.canonical = canonical or max_length is not None
+        self.max_length = max_length
+        if self.canonical:
+            self.code = create_canonical_huffman_codes(self.symbols, self.probabilities, max_length)
+        else:
+            self.code = create_huffman_codes(self.symbols, self.probabilities)
+        self.codes = code_values(self.code)
+        self._decoder = None
+        self._bulk = None
+
+    @property
+    def decoder(self):
+        if self._decoder is None:
+            self._decoder = TableDecoder(self.code)
+        return self._decoder
+
+    def bulk_tables(self, message):
+        # the numpy tables if message is long enough to be encoded with them
+        if len(message) < BULK_THRESHOLD:
+            return None
+        if self._bulk is None:
+            self._bulk = False
+            if all(len(symbol) == 1 for symbol in self.symbols):
+                try:
+                    import huffman_bulk
+                    self._bulk = huffman_bulk.BulkTables(self.codes)
+                except ImportError:
+                    pass
+        return self._bulk or None
+
+    def encode(self, message):
+        bulk = self.bulk_tables(message)
+        if bulk is not None:
+            return bulk.encode(message)
+        code = self.code
+        return ''.join([code[char] for char in strip_message(message)])
+
+    def pack(self, message):
+        bulk = self.bulk_tables(message)
+        if bulk is not None:
+            return PackedBits(*bulk.pack(message))
+        return _pack(self.codes, strip_message(message))
+
+    def encode_bytes(self, message):
+        if self.canonical:
+            return write_canonical_container(self.code, self.pack(message))
+        if len(self.code) == 1 and not next(iter(self.code.values())):
+            # the empty code of a one-symbol alphabet would not keep the length of
+            # the message: the container gets a one-bit code, as the canonical one
+            code = {symbol: '0' for symbol in self.code}
+            return write_container(code, pack_message(code, strip_message(message)))
+        return write_container(self.code, self.pack(message))
+
+    def decode(self, encoded_string):
+        return self.decoder.decode(encoded_string)
+
+    def __repr__(self):
+        return f"HuffmanModel({len(self.symbols)} symbols, canonical={self.canonical}, max_length={self.max_length})"
+
+@functools.lru_cache(maxsize=32)
+def _cached_model(symbols, probabilities, canonical, max_length):
+    return HuffmanModel(symbols, probabilities, canonical, max_length)
+
+def get_model(symbols, probabilities, canonical=False, max_length=None):
+    # HuffmanModel from an LRU cache of the last 32 models, keyed by the
+    # (symbols, probabilities) vectors: with a static model the code is built
+    # only once. _cached_model.cache_info() has the hit and miss counts.
+    if not (len(symbols) == len(probabilities)):
+        raise ValueError("Length of characters and probabilities must be equal: len(characters) = ", len(symbols), "len(probabilities) = ", len(probabilities))
+    return _cached_model(tuple(symbols), tuple(probabilities), canonical, max_length)
+
+STRIP_TABLE = str.maketrans('', '', string.punctuation + ' \n')
+
+def strip_message(message):
+    return message.translate(STRIP_TABLE).lower()
+
+def encode(characters, probabilities, message, canonical=False, model=None):
+    # model: a HuffmanModel to use instead of characters and probabilities
+    if model is None:
+        model = get_model(characters, probabilities, canonical)
+    return model.encode(message)
+
+def code_values(code):
+    # symbol -> (value, length); the empty code of a one-symbol alphabet is (0, 0)
+    return {symbol: (int(value or '0', 2), len(value)) for symbol, value in code.items()}
+
+def _pack(codes, message):
+    # codes: symbol -> (value, length)
+    writer = BitWriter()
+    write = writer.write
+    for symbol in message:
+        write(*codes[symbol])
+    return writer
+
+def pack_message(code, message):
+    # BitWriter with the codes of the symbols of message
+    return _pack(code_values(code), message)
+
+def write_container(code, writer):
+    table = bytearray()
+    for symbol, value in code.items():
+        symbol_bytes = symbol.encode('utf-8')
+        packed = BitWriter()
+        packed.write_bits(value)
+        table += SYMBOL.pack(len(symbol_bytes), len(value)) + symbol_bytes + packed.getvalue()
+    return HEADER.pack(MAGIC, len(code)) + bytes(table) + BIT_COUNT.pack(writer.nr_bits) + writer.getvalue()
+
+def write_canonical_container(code, writer):
+    # code must be canonical (canonical_codes): only the lengths are written
+    symbols = list(code)
+    lengths = [len(code[symbol]) for symbol in symbols]
+    if max(lengths) > 255:
+        raise ValueError("Code lengths above 255 bits do not fit in the compact header")
+    header = bytearray(HEADER.pack(CANONICAL_MAGIC, len(symbols)))
+    header += bytes(lengths)
+    if all(len(symbol) == 1 for symbol in symbols):
+        text = ''.join(symbols).encode('utf-8')
+        header += LENGTH.pack(1) + TEXT_LENGTH.pack(len(text)) + text
+    else:
+        header += LENGTH.pack(0)
+        for symbol in symbols:
+            symbol_bytes = symbol.encode('utf-8')
+            header += LENGTH.pack(len(symbol_bytes)) + symbol_bytes
+    return bytes(header) + BIT_COUNT.pack(writer.nr_bits) + writer.getvalue()
+
+def read_canonical_table(data, count, offset):
+    # (symbols, lengths, offset after the table)
+    lengths = list(data[offset:offset + count])
+    offset += count
+    flags, = LENGTH.unpack_from(data, offset)
+    offset += LENGTH.size
+    if flags & 1:
+        text_length, = TEXT_LENGTH.unpack_from(data, offset)
+        offset += TEXT_LENGTH.size
+        symbols = list(bytes(data[offset:offset + text_length]).decode('utf-8'))
+        offset += text_length
+    else:
+        symbols = []
+        for _ in range(count):
+            symbol_length, = LENGTH.unpack_from(data, offset)
+            offset += LENGTH.size
+            symbols.append(bytes(data[offset:offset + symbol_length]).decode('utf-8'))
+            offset += symbol_length
+    if len(symbols) != count:
+        raise ValueError("Corrupted code table")
+    return symbols, lengths, offset
+
+def read_container(data):
+    # (code, BitReader over the payload), for both container formats
+    magic, count = HEADER.unpack_from(data, 0)
+    if magic == CANONICAL_MAGIC:
+        symbols, lengths, offset = read_canonical_table(data, count, HEADER.size)
+        code = canonical_codes(symbols, lengths)
+        nr_bits, = BIT_COUNT.unpack_from(data, offset)
+        return code, BitReader(data, nr_bits, offset + BIT_COUNT.size)
+    if magic != MAGIC:
+        raise ValueError("Not a Huffman encoded file")
+    offset = HEADER.size
+    code = {}
+    for _ in range(count):
+        symbol_length, code_length = SYMBOL.unpack_from(data, offset)
+        offset += SYMBOL.size
+        symbol = bytes(data[offset:offset + symbol_length]).decode('utf-8')
+        offset += symbol_length
+        code_bytes = (code_length + 7) // 8
+        value = BitReader(data, code_length, offset).read(code_length)
+        code[symbol] = format(value, f'0{code_length}b') if code_length else ''
+        offset += code_bytes
+    nr_bits, = BIT_COUNT.unpack_from(data, offset)
+    return code, BitReader(data, nr_bits, offset + BIT_COUNT.size)
+
+def decode_bits(code, reader, decoder=None):
+    # decode all the remaining bits of a BitReader
+    decoder = decoder or TableDecoder(code)
+    decoded = decoder.decode_bytes(reader.data, reader.remaining(), reader.position)
+    reader.position = reader.end
+    return decoded
+
+def encode_bytes(characters, probabilities, message, canonical=True, model=None):
+    # the message encoded in the binary container, with the compact header of
+    # the canonical code unless canonical is False
+    if model is None:
+        max_length = max(MAX_CODE_LENGTH, (len(characters) - 1).bit_length()) if canonical else None
+        model = get_model(characters, probabilities, canonical, max_length)
+    return model.encode_bytes(message)
+
+@functools.lru_cache(maxsize=64)
+def canonical_decoder(symbols, lengths):
+    # the decoder of a canonical code, shared by the containers with the same header
+    return TableDecoder(canonical_codes(symbols, lengths))
+
+def decode_bytes(data):
+    magic, count = HEADER.unpack_from(data, 0)
+    if magic == CANONICAL_MAGIC:
+        symbols, lengths, offset = read_canonical_table(data, count, HEADER.size)
+        nr_bits, = BIT_COUNT.unpack_from(data, offset)
+        return canonical_decoder(tuple(symbols), tuple(lengths)).decode_bytes(data, nr_bits, (offset + BIT_COUNT.size) * 8)
+    return decode_bits(*read_container(data))
+
+def encode_file(characters, probabilities, input_path, output_path, canonical=True):
+    # returns the sizes in bytes of the input and of the output
+    with open(input_path, 'r', encoding='utf-8') as file:
+        message = file.read()
+    data = encode_bytes(characters, probabilities, message, canonical)
+    with open(output_path, 'wb') as file:
+        file.write(data)
+    return len(message.encode('utf-8')), len(data)
+
+def decode_file(input_path, output_path):
+    # returns the number of decoded symbols
+    with open(input_path, 'rb') as file:
+        message = decode_bytes(file.read())
+    with open(output_path, 'w', encoding='utf-8') as file:
+        file.write(message)
+    return len(message)
+
+def benchmark_decode(nr_bits=4000000, naive_bits=100000, table_bits=10):
+    # Decoding throughput on the Dorian Gray text, coded with its own letter
+    # frequencies and repeated up to about nr_bits bits. The startswith decoder
+    # is quadratic, so it only decodes about naive_bits bits.
+    file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'preprocessed_dorian_gray.txt')
+    with open(file_path, 'r', encoding='utf-8') as file:
+        text = strip_message(file.read())
+    counts = Counter(text)
+    symbols = sorted(counts)
+    code = create_huffman_codes(symbols, [counts[symbol] / len(text) for symbol in symbols])
+    encoded_text = ''.join(code[char] for char in text)
+
+    print(f"{'Decoder':<25}{'Bits':<12}{'Time (s)':<12}{'Mbit/s':<12}{'Symbols/s':<12}")
+    print("-" * 73)
+    def report(name, function, repeats):
+        encoded = encoded_text * repeats
+        start = time.perf_counter()
+        decoded = function(encoded)
+        elapsed = time.perf_counter() - start
+        if decoded != text * repeats:
+            raise ValueError(f"{name} decoded a wrong message")
+        print(f"{name:<25}{len(encoded):<12}{elapsed:<12.4f}{len(encoded) / elapsed / 1e6:<12.3f}{len(decoded) / elapsed:<12.0f}")
+
+    report("startswith", lambda encoded: decode_startswith(code, encoded), max(1, naive_bits // len(encoded_text)))
+    decoder = TableDecoder(code, table_bits)
+    repeats = max(1, nr_bits // len(encoded_text))
+    report(f"table ({table_bits} bits)", decoder.decode, repeats)
+    packed = pack_message(code, text * repeats)
+    report("table, packed bytes", lambda _: decoder.decode_bytes(packed.getvalue(), packed.nr_bits), repeats)
+
+def benchmark_build(sizes=(26, 256, 1024, 4096, 16384, 65536), pairwise_limit=4096, max_length=MAX_CODE_LENGTH):
+    # Build time of the Huffman code (heap) and of the length-limited code
+    # (package-merge) for Zipf-distributed alphabets, and time of the prefix
+    # check, sorted against pairwise (only up to pairwise_limit symbols)
+    print(f"{'Symbols':<10}{'Huffman (s)':<14}{'Max length':<12}{'Limited (s)':<14}{'Limit':<8}{'Cost +%':<10}{'Check (s)':<12}{'Pairwise (s)':<12}")
+    print("-" * 92)
+    for n in sizes:
+        weights = [1 / (i + 1) for i in range(n)]
+        total = sum(weights)
+        probabilities = [weight / total for weight in weights]
+        symbols = [f"s{i}" for i in range(n)]
+
+        start = time.perf_counter()
+        code = create_huffman_codes(symbols, probabilities)
+        huffman_time = time.perf_counter() - start
+        huffman_lengths = [len(code[symbol]) for symbol in symbols]
+
+        limit = max(max_length, (n - 1).bit_length())
+        start = time.perf_counter()
+        limited_lengths = package_merge_lengths(probabilities, limit)
+        canonical = canonical_codes(symbols, limited_lengths)
+        limited_time = time.perf_counter() - start
+        huffman_cost = sum(p * length for p, length in zip(probabilities, huffman_lengths))
+        limited_cost = sum(p * length for p, length in zip(probabilities, limited_lengths))
+
+        start = time.perf_counter()
+        if not is_prefix_free(canonical):
+            raise ValueError("package-merge built a code that is not prefix-free")
+        check_time = time.perf_counter() - start
+        pairwise = "-"
+        if n <= pairwise_limit:
+            start = time.perf_counter()
+            is_prefix_free_pairwise(canonical)
+            pairwise = f"{time.perf_counter() - start:.4f}"
+
+        print(f"{n:<10}{huffman_time:<14.4f}{max(huffman_lengths):<12}{limited_time:<14.4f}{limit:<8}{(limited_cost / huffman_cost - 1) * 100:<10.3f}{check_time:<12.4f}{pairwise:<12}")
+
+def benchmark_encode(nr_characters=4000000):
+    # Encoding throughput on the raw Dorian Gray and Kafka texts (punctuation
+    # included), each one coded with its own character frequencies and repeated
+    # up to about nr_characters characters: pure Python against numpy
+    directory = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'Text':<18}{'Characters':<12}{'Encoder':<22}{'Time (s)':<12}{'MB/s':<10}")
+    print("-" * 74)
+    for name in ('dorian_gray.txt', 'kafka.txt'):
+        with open(os.path.join(directory, name), 'r', encoding='utf-8') as file:
+            text = file.read()
+        stripped = strip_message(text)
+        counts = Counter(stripped)
+        symbols = sorted(counts)
+        model = HuffmanModel(symbols, [counts[symbol] / len(stripped) for symbol in symbols], canonical=True, max_length=MAX_CODE_LENGTH)
+        message = text * max(1, nr_characters // len(text))
+
+        results = {}
+        encoders = [
+            ("python, packed", lambda: _pack(model.codes, strip_message(message)).getvalue()),
+            ("python, bit string", lambda: ''.join([model.code[char] for char in strip_message(message)])),
+        ]
+        if model.bulk_tables(message) is not None:
+            encoders += [("numpy, packed", lambda: model.pack(message).getvalue()), ("numpy, bit string", lambda: model.encode(message))]
+        for encoder, function in encoders:
+            start = time.perf_counter()
+            results[encoder] = function()
+            elapsed = time.perf_counter() - start
+            print(f"{name:<18}{len(message):<12}{encoder:<22}{elapsed:<12.4f}{len(message) / elapsed / 1e6:<10.2f}")
+        if len(encoders) == 2:
+            print(f"{name:<18}{len(message):<12}numpy not available")
+        elif results["numpy, packed"] != results["python, packed"] or results["numpy, bit string"] != results["python, bit string"]:
+            raise ValueError("numpy and pure Python encoders disagree")
 
 def run_demo():
     chars = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'o', 'p', 'q', 'r', 's', 't', 'u', 'v', 'w', 'x', 'y', 'z']
@@ -93,10 +620,11 @@ def run_demo():
     print("Probabilities: ", probabilities)
     print("Message: hello, world!")
 
-    encoded_message = encode(chars, probabilities, 'hello, world!')
+    model = get_model(chars, probabilities)
+    encoded_message = encode(chars, probabilities, 'hello, world!', model=model)
     print("Encoded message: ", encoded_message)
 
-    decoded_message = decode(create_huffman_codes(chars, probabilities), encoded_message)
+    decoded_message = decode(model, encoded_message)
     print("Decoded message: ", decoded_message)
 
 def main():
@@ -108,6 +636,8 @@ Commands:
                       Parameters:
                         -a: Alphabet (characters)
                         -p: Probabilities
+                        --canonical: Canonical Huffman code (same code lengths, codes rebuilt from the lengths)
+                        --max-length: Canonical code with codes of at most this many bits (package-merge)
                       Output: Huffman code (an optimal prefix free  code)
                       Example: python3 ./huffman.py create_huffman_code -a "a b c" -p "0.8 0.05 0.15"
 
@@ -116,15 +646,42 @@ Commands:
                         -m: Message
                         -a: Alphabet (characters)
                         -p: Probabilities
-                      Output: Encoded message
+                        -i, -o: Encode the text file -i into the binary file -o instead of -m
+                        --canonical: Use the canonical Huffman code
+                        --full-table: With -o, store the whole code table instead of the code lengths only
+                      Output: Encoded message (or the sizes of the input and output files)
                       Example: python3 huffman.py encode -m "ccab" -a "a b c" -p "0.8 0.05 0.15"
+                      Example: python3 huffman.py encode -i preprocessed_kafka.txt -o kafka.huf -a "a b c ..." -p "..."
 
   decode              Decode a message
                       Parameters:
                         -e: Encoded message (binary string)
                         -c: Prefix Free Code (not necessarily Huffman)
+                        -l: Code lengths of a canonical code, instead of -c
+                        -i, -o: Decode the binary file -i (written by encode -o) into the text file -o instead of -e, -c
                       Output: Decoded message
                       Example: python3 huffman.py decode -e "0101100" -c "a: 1, b: 00, c: 01"      
+                      Example: python3 huffman.py decode -e "1111010" -l "a: 1, b: 2, c: 2"
+                      Example: python3 huffman.py decode -i kafka.huf -o kafka.txt
+
+  benchmark_decode    Decoding throughput on the Dorian Gray text: startswith decoder against the table-driven one
+                      Parameters:
+                        -b: Number of encoded bits for the table-driven decoder (default: 4000000)
+                        --naive-bits: Number of encoded bits for the startswith decoder (default: 100000)
+                        -t: Table bits (default: 10)
+                      Example: python3 huffman.py benchmark_decode -b 8000000
+
+  benchmark_build     Build time of Huffman and length-limited codes, and of the prefix check
+                      Parameters:
+                        -s: Alphabet sizes (default: 26 256 1024 4096 16384 65536)
+                        -l: Maximum code length, raised to log2(size) when needed (default: 15)
+                        --pairwise-limit: Largest alphabet for the pairwise prefix check (default: 4096)
+                      Example: python3 huffman.py benchmark_build -s 26 1024 65536
+
+  benchmark_encode    Encoding throughput on the raw Dorian Gray and Kafka texts: pure Python against numpy
+                      Parameters:
+                        -c: Number of characters of each text, repeated (default: 4000000)
+                      Example: python3 huffman.py benchmark_encode -c 8000000
 
   demo                Run demo
                       Output: Encoded and decoded hardcoded message : "hello, world!"
@@ -138,17 +695,42 @@ Commands:
     parser_create_huffman_code = subparsers.add_parser("create_huffman_code", help="Create a Huffman code")
     parser_create_huffman_code.add_argument("-a", type=str, required=True, help="Alphabet (characters)")
     parser_create_huffman_code.add_argument("-p", type=str, required=True, help="Probabilities")
+    parser_create_huffman_code.add_argument("--canonical", action="store_true", help="Canonical Huffman code")
+    parser_create_huffman_code.add_argument("--max-length", type=int, default=None, help="Maximum code length")
 
     # Encode
     parser_encode = subparsers.add_parser("encode", help="Encode a message")
-    parser_encode.add_argument("-m", type=str, required=True, help="Message")
+    parser_encode.add_argument("-m", type=str, help="Message")
     parser_encode.add_argument("-a", type=str, required=True, help="Alphabet (characters)")
     parser_encode.add_argument("-p", type=str, required=True, help="Probabilities")
+    parser_encode.add_argument("-i", type=str, help="Input text file")
+    parser_encode.add_argument("-o", type=str, help="Output binary file")
+    parser_encode.add_argument("--canonical", action="store_true", help="Use the canonical Huffman code")
+    parser_encode.add_argument("--full-table", action="store_true", help="Store the whole code table in the output file")
 
     # Decode
     parser_decode = subparsers.add_parser("decode", help="Decode a message")
-    parser_decode.add_argument("-e", type=str, required=True, help="Encoded message (binary string)")
-    parser_decode.add_argument("-c", type=str, required=True, help="Prefix Free Code (not necessarily Huffman)")
+    parser_decode.add_argument("-e", type=str, help="Encoded message (binary string)")
+    parser_decode.add_argument("-c", type=str, help="Prefix Free Code (not necessarily Huffman)")
+    parser_decode.add_argument("-l", type=str, help="Code lengths of a canonical code")
+    parser_decode.add_argument("-i", type=str, help="Input binary file")
+    parser_decode.add_argument("-o", type=str, help="Output text file")
+
+    # Decoding benchmark
+    parser_benchmark_decode = subparsers.add_parser("benchmark_decode", help="Decoding throughput")
+    parser_benchmark_decode.add_argument("-b", type=int, default=4000000, help="Number of encoded bits for the table-driven decoder")
+    parser_benchmark_decode.add_argument("--naive-bits", type=int, default=100000, help="Number of encoded bits for the startswith decoder")
+    parser_benchmark_decode.add_argument("-t", type=int, default=10, help="Table bits")
+
+    # Build benchmark
+    parser_benchmark_build = subparsers.add_parser("benchmark_build", help="Code build time")
+    parser_benchmark_build.add_argument("-s", type=int, nargs="+", default=[26, 256, 1024, 4096, 16384, 65536], help="Alphabet sizes")
+    parser_benchmark_build.add_argument("-l", type=int, default=MAX_CODE_LENGTH, help="Maximum code length")
+    parser_benchmark_build.add_argument("--pairwise-limit", type=int, default=4096, help="Largest alphabet for the pairwise prefix check")
+
+    # Encoding benchmark
+    parser_benchmark_encode = subparsers.add_parser("benchmark_encode", help="Encoding throughput")
+    parser_benchmark_encode.add_argument("-c", type=int, default=4000000, help="Number of characters of each text")
 
     # Demo
     subparsers.add_parser("demo", help="Run demo")
@@ -160,19 +742,48 @@ Commands:
     elif args.command == "create_huffman_code":
         chars = args.a.split()
         probabilities = [float(x) for x in args.p.split()]
-        huffman_code = create_huffman_codes(chars, probabilities)
+        if args.canonical or args.max_length is not None:
+            huffman_code = create_canonical_huffman_codes(chars, probabilities, args.max_length)
+        else:
+            huffman_code = create_huffman_codes(chars, probabilities)
         print(f"Huffman code: {huffman_code}")
+    elif args.command == "encode" and (args.i or args.o):
+        if not (args.i and args.o):
+            parser.error("encode: -i and -o must be given together")
+        chars = args.a.split()
+        probabilities = [float(x) for x in args.p.split()]
+        input_size, output_size = encode_file(chars, probabilities, args.i, args.o, not args.full_table)
+        print(f"Encoded {args.i} ({input_size} bytes) into {args.o} ({output_size} bytes)")
     elif args.command == "encode":
+        if args.m is None:
+            parser.error("encode: either -m or -i and -o are required")
         chars = args.a.split()
         probabilities = [float(x) for x in args.p.split()]
         message = args.m
-        encoded_message = encode(chars, probabilities, message)
+        encoded_message = encode(chars, probabilities, message, args.canonical)
         print(f"Encoded message: {encoded_message}")
+    elif args.command == "decode" and (args.i or args.o):
+        if not (args.i and args.o):
+            parser.error("decode: -i and -o must be given together")
+        nr_symbols = decode_file(args.i, args.o)
+        print(f"Decoded {args.i} into {args.o} ({nr_symbols} symbols)")
     elif args.command == "decode":
-        code = {k: v for k, v in (item.split(": ") for item in args.c.split(", "))}
+        if args.e is None or (args.c is None) == (args.l is None):
+            parser.error("decode: either -e and one of -c, -l or -i and -o are required")
+        if args.l is not None:
+            lengths = [item.split(": ") for item in args.l.split(", ")]
+            code = canonical_codes([symbol for symbol, _ in lengths], [int(length) for _, length in lengths])
+        else:
+            code = {k: v for k, v in (item.split(": ") for item in args.c.split(", "))}
         encoded_message = args.e
         decoded_message = decode(code, encoded_message)
         print(f"Decoded message: {decoded_message}")
+    elif args.command == "benchmark_decode":
+        benchmark_decode(args.b, args.naive_bits, args.t)
+    elif args.command == "benchmark_build":
+        benchmark_build(args.s, args.pairwise_limit, args.l)
+    elif args.command == "benchmark_encode":
+        benchmark_encode(args.c)
     elif args.command == "demo":
         run_demo()
 
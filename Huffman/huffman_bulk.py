@@ -0,0 +1,93 @@
+import string
+
+import numpy as np
+
+# Vectorized encoder for long messages (used by HuffmanModel when numpy is
+# available). The message is turned into an array of symbol indices with a
+# lookup table indexed by code point, the code values and lengths are gathered
+# per symbol and the cumulative sum of the lengths gives the position of every
+# code in the output. A code of at most 32 bits falls in one 32-bit output word
+# or spans two: it is shifted into place and the parts of every word are
+# summed with bincount (the codes do not overlap, so the sum is an OR, and the
+# float64 sums of values below 2^32 are exact). Longer codes are scattered one
+# bit at a time.
+
+SKIP = -1       # lookup table entry: character removed by strip_message
+INVALID = -2    # lookup table entry: character without a code
+
+STRIPPED = string.punctuation + ' \n'
+
+class BulkTables:
+    # lookup table and per-symbol arrays of a code, built once per model
+    def __init__(self, codes):
+        # codes: symbol -> (value, length), every symbol a single character
+        symbols = list(codes)
+        size = max(max(ord(symbol) for symbol in symbols), max(ord(char) for char in STRIPPED)) + 1
+        self.lookup = np.full(size, INVALID, dtype=np.int32)
+        for char in STRIPPED:
+            self.lookup[ord(char)] = SKIP
+        for i, symbol in enumerate(symbols):
+            self.lookup[ord(symbol)] = i
+        self.index_type = np.uint8 if len(symbols) <= 256 else np.int32
+        self.values = np.array([codes[symbol][0] for symbol in symbols], dtype=np.uint64)
+        self.lengths = np.array([codes[symbol][1] for symbol in symbols], dtype=np.int64)
+        self.max_length = int(self.lengths.max())
+
+    def symbol_indices(self, message):
+        points = np.frombuffer(message.lower().encode('utf-32-le'), dtype=np.uint32)
+        in_table = points < len(self.lookup)
+        indices = np.full(len(points), INVALID, dtype=np.int32)
+        indices[in_table] = self.lookup[points[in_table]]
+        invalid = np.flatnonzero(indices == INVALID)
+        if len(invalid):
+            # same error as the dict lookup of the pure Python encoder
+            raise KeyError(chr(points[invalid[0]]))
+        return indices[indices != SKIP].astype(self.index_type)
+
+    def positions(self, message):
+        # (values, lengths, starts, number of bits) of the codes of message
+        indices = self.symbol_indices(message)
+        values = self.values[indices]
+        lengths = self.lengths[indices]
+        ends = np.cumsum(lengths)
+        nr_bits = int(ends[-1]) if len(ends) else 0
+        return values, lengths, ends - lengths, nr_bits
+
+    def pack(self, message):
+        # (bytes, number of bits), the last byte zero padded as in BitWriter
+        if self.max_length > 32:
+            bits = self._scatter_bits(*self.positions(message))
+            return np.packbits(bits).tobytes(), len(bits)
+        values, lengths, starts, nr_bits = self.positions(message)
+        nr_words = (nr_bits + 31) >> 5
+        words = starts >> 5
+        ends = (starts & 31) + lengths
+        spill = np.maximum(ends - 32, 0)
+        # the part in the first word: the code without its spilled low bits, aligned to the right end of the code
+        first = (values >> spill.astype(np.uint64)) << (32 - ends + spill).astype(np.uint64)
+        total = np.bincount(words, weights=first.astype(np.float64), minlength=nr_words)
+        spilled = np.flatnonzero(spill)
+        if len(spilled):
+            low_bits = spill[spilled].astype(np.uint64)
+            second = (values[spilled] & ((np.uint64(1) << low_bits) - np.uint64(1))) << (np.uint64(32) - low_bits)
+            total += np.bincount(words[spilled] + 1, weights=second.astype(np.float64), minlength=nr_words)
+        data = total.astype('>u4').tobytes()
+        return data[:(nr_bits + 7) >> 3], nr_bits
+
+    def _scatter_bits(self, values, lengths, starts, nr_bits):
+        # uint8 array with one bit per element, one bit of every code per pass
+        bits = np.zeros(nr_bits, dtype=np.uint8)
+        for j in range(self.max_length):
+            # bit j (from the most significant one) of every code with more than j bits
+            selected = np.flatnonzero(lengths > j)
+            if not len(selected):
+                break
+            shifts = (lengths[selected] - 1 - j).astype(np.uint64)
+            bits[starts[selected] + j] = (values[selected] >> shifts) & np.uint64(1)
+        return bits
+
+    def encode(self, message):
+        # string of '0' and '1'
+        data, nr_bits = self.pack(message)
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))[:nr_bits]
+        return (bits + ord('0')).tobytes().decode('ascii')
@@ -1,6 +1,7 @@
 import argparse
 import os
 import huffman
+from bitio import BitWriter
 
 def lz78_decode(input_stream):
     dictionary = {0: ""}  
@@ -92,6 +93,9 @@ def lz_vs_huffman():
     file_path = os.path.join(os.path.dirname(__file__), 'preprocessed_dorian_gray.txt')
     text = read_text_file(file_path)
 
+    # the frequencies do not change between sections: the code is built once
+    model = huffman.get_model(chars, probabilities, canonical=True, max_length=huffman.MAX_CODE_LENGTH)
+
     huffman_compression_ratios = []
     lz78_compression_ratios = []
 
@@ -100,15 +104,19 @@ def lz_vs_huffman():
         end_index = start_index + 1500
         text_section = text[start_index:end_index]
 
-        huffman_encoded = huffman.encode(chars, probabilities, text_section)
-        lz78_encoded = lz78_encode(text_section)
+        # real output sizes in bytes: the Huffman container (code table included)
+        # and the LZ78 bits packed 8 per byte, with the same 8-byte bit count
+        huffman_encoded = model.encode_bytes(text_section)
+        lz78_writer = BitWriter()
+        lz78_writer.write_bits(lz78_encode(text_section))
+        lz78_size = len(lz78_writer.getvalue()) + huffman.BIT_COUNT.size
 
-        text_section_binary = ''.join(format(ord(char), '08b') for char in text_section)
+        text_section_size = len(text_section.encode('utf-8'))
         
-        huffman_compression_ratio = (1-len(huffman_encoded) / len(text_section_binary));
+        huffman_compression_ratio = (1-len(huffman_encoded) / text_section_size);
         huffman_compression_ratios.append(huffman_compression_ratio)
         
-        lz78_compression_ratio = (1-len(lz78_encoded) / len(text_section_binary));   
+        lz78_compression_ratio = (1-lz78_size / text_section_size);   
         lz78_compression_ratios.append(lz78_compression_ratio)
 
 
@@ -141,7 +149,7 @@ demo                Run demo
 
 lz_vs_huffman       Compare compression ratios of LZ78 and Huffman
                     Input: preprocessed_dorian_gray.txt, already in the same directory
-                    Output: Average compression ratios of LZ78 and Huffman
+                    Output: Average compression ratios of LZ78 and Huffman, from the sizes in bytes of the encoded output
                     Example: python3 lempel_ziv.py lz_vs_huffman
 """,
         formatter_class=argparse.RawTextHelpFormatter,
@@ -0,0 +1,266 @@
+import argparse
+import random
+import time
+
+from EsponenziazioneVeloce import binary_modular_exponentiation
+
+# Esponenziazione modulare a finestra:
+# - sliding window: una tabella con le potenze dispari a^1, a^3, ..., a^(2^w - 1)
+#   permette di consumare fino a w bit dell'esponente con una sola moltiplicazione
+# - base fissa: se base e modulo sono sempre gli stessi, si precalcolano una volta
+#   le potenze a^(j * 2^(w*i)) e ogni esponente costa circa bits / w moltiplicazioni,
+#   senza nessun quadrato
+
+def window_size(bits):
+    # Window that minimizes precomputation + multiplications for a given exponent size
+    if bits <= 8:
+        return 1
+    if bits <= 24:
+        return 2
+    if bits <= 80:
+        return 3
+    if bits <= 240:
+        return 4
+    if bits <= 672:
+        return 5
+    return 6
+
+def sliding_window_exponentiation(a, b, m, w=None):
+    if m == 1:
+        return 0
+    if b == 0:
+        return 1
+    if w is None:
+        w = window_size(b.bit_length())
+    a = a % m
+
+    # odd_powers[i] = a^(2i + 1) mod m
+    a_squared = a * a % m
+    odd_powers = [a]
+    for _ in range((1 << (w - 1)) - 1):
+        odd_powers.append(odd_powers[-1] * a_squared % m)
+
+    result = 1
+    i = b.bit_length() - 1
+    while i >= 0:
+        if not (b >> i) & 1:
+            result = result * result % m
+            i -= 1
+            continue
+        # longest window b[i..j] of at most w bits that ends with a 1
+        j = max(i - w + 1, 0)
+        while not (b >> j) & 1:
+            j += 1
+        window = (b >> j) & ((1 << (i - j + 1)) - 1)
+        for _ in range(i - j + 1):
+            result = result * result % m
+        result = result * odd_powers[window >> 1] % m
+        i = j - 1
+    return result
+
+class FixedBaseExponentiation:
+    # table[i][j] = a^(j * 2^(w*i)) mod m, for exponents of at most max_bits bits
+    __slots__ = ("base", "modulus", "window", "max_bits", "table")
+
+    def __init__(self, a, m, max_bits, w=4):
+        self.base = a % m
+        self.modulus = m
+        self.window = w
+        self.max_bits = max_bits
+        self.table = []
+        power = self.base
+        for _ in range((max_bits + w - 1) // w):
+            row = [1]
+            for _ in range((1 << w) - 1):
+                row.append(row[-1] * power % m)
+            self.table.append(row)
+            # a^(2^(w*(i+1))) = a^((2^w - 1) * 2^(w*i)) * a^(2^(w*i))
+            power = row[-1] * power % m
+
+    def pow(self, b):
+        if b.bit_length() > self.max_bits:
+            return pow(self.base, b, self.modulus)
+        m = self.modulus
+        mask = (1 << self.window) - 1
+        result = 1
+        for row in self.table:
+            if b == 0:
+                break
+            digit = b & mask
+            if digit:
+                result = result * row[digit] % m
+            b >>= self.window
+        return result % m
+
+def multi_pow(bases, exponents, n):
+    # prod(bases[i]^exponents[i]) mod n with one shared chain of squarings.
+    # Negative exponents use the modular inverse of the base.
+    if len(bases) != len(exponents):
+        raise ValueError("bases and exponents must have the same length")
+    if n == 1:
+        return 0
+    normalized_bases = []
+    normalized_exponents = []
+    for a, b in zip(bases, exponents):
+        if b < 0:
+            a = pow(a, -1, n)
+            b = -b
+        if b:
+            normalized_bases.append(a % n)
+            normalized_exponents.append(b)
+    if not normalized_bases:
+        return 1
+    if len(normalized_bases) <= 8:
+        return simultaneous_exponentiation(normalized_bases, normalized_exponents, n)
+    return interleaved_exponentiation(normalized_bases, normalized_exponents, n)
+
+def simultaneous_exponentiation(bases, exponents, n):
+    # Shamir/Straus: products[s] = product of the bases whose index is in the
+    # subset s, then each bit position costs one squaring and one multiplication
+    products = [1] * (1 << len(bases))
+    for i, a in enumerate(bases):
+        bit = 1 << i
+        for s in range(bit):
+            products[bit | s] = products[s] * a % n
+
+    result = 1
+    for position in range(max(b.bit_length() for b in exponents) - 1, -1, -1):
+        result = result * result % n
+        s = 0
+        for i, b in enumerate(exponents):
+            if (b >> position) & 1:
+                s |= 1 << i
+        if s:
+            result = result * products[s] % n
+    return result
+
+def interleaved_exponentiation(bases, exponents, n):
+    # Many bases: every base gets its own sliding window table of odd powers,
+    # the windows of all the bases are multiplied into the same accumulator
+    windows = [window_size(b.bit_length()) for b in exponents]
+    tables = []
+    for a, w in zip(bases, windows):
+        a_squared = a * a % n
+        odd_powers = [a]
+        for _ in range((1 << (w - 1)) - 1):
+            odd_powers.append(odd_powers[-1] * a_squared % n)
+        tables.append(odd_powers)
+
+    # windows ending at bit position j: ends[j] = [(table index, odd value), ...]
+    top = max(b.bit_length() for b in exponents)
+    ends = [[] for _ in range(top)]
+    for index, (b, w) in enumerate(zip(exponents, windows)):
+        i = b.bit_length() - 1
+        while i >= 0:
+            if not (b >> i) & 1:
+                i -= 1
+                continue
+            j = max(i - w + 1, 0)
+            while not (b >> j) & 1:
+                j += 1
+            ends[j].append((index, ((b >> j) & ((1 << (i - j + 1)) - 1)) >> 1))
+            i = j - 1
+
+    result = 1
+    for position in range(top - 1, -1, -1):
+        result = result * result % n
+        for index, value in ends[position]:
+            result = result * tables[index][value] % n
+    return result
+
+def benchmark_multi_pow(bits=1024, nr_tests=5, max_bases=8):
+    n = random.getrandbits(bits) | (1 << (bits - 1)) | 1
+    print(f"{bits}-bit modulus and exponents, {nr_tests} products per row")
+    print(f"{'Bases':<8}{'naive pow product (s)':<24}{'multi_pow (s)':<20}")
+    print("-" * 52)
+    for nr_bases in range(2, max_bases + 1):
+        tests = []
+        for _ in range(nr_tests):
+            bases = [random.randrange(2, n) for _ in range(nr_bases)]
+            exponents = [random.getrandbits(bits) for _ in range(nr_bases)]
+            tests.append((bases, exponents))
+
+        start = time.perf_counter()
+        expected = []
+        for bases, exponents in tests:
+            result = 1
+            for a, b in zip(bases, exponents):
+                result = result * pow(a, b, n) % n
+            expected.append(result)
+        naive_time = (time.perf_counter() - start) / nr_tests
+
+        start = time.perf_counter()
+        results = [multi_pow(bases, exponents, n) for bases, exponents in tests]
+        multi_pow_time = (time.perf_counter() - start) / nr_tests
+        if results != expected:
+            raise ValueError("multi_pow returned a wrong result")
+        print(f"{nr_bases:<8}{naive_time:<24.6f}{multi_pow_time:<20.6f}")
+
+def benchmark(bits=1024, nr_exponents=20):
+    m = random.getrandbits(bits) | (1 << (bits - 1)) | 1
+    a = random.randrange(2, m)
+    exponents = [random.getrandbits(bits) for _ in range(nr_exponents)]
+
+    start = time.perf_counter()
+    fixed_base = FixedBaseExponentiation(a, m, bits)
+    precomputation_time = time.perf_counter() - start
+
+    methods = [
+        ("binary (square and multiply)", lambda b: binary_modular_exponentiation(a, b, m)),
+        ("sliding window", lambda b: sliding_window_exponentiation(a, b, m)),
+        ("fixed base (precomputed)", fixed_base.pow),
+        ("built-in pow", lambda b: pow(a, b, m)),
+    ]
+    expected = [pow(a, b, m) for b in exponents]
+    print(f"{bits}-bit modulus and exponents, {nr_exponents} exponents")
+    print(f"{'Method':<32}{'Average time (s)':<20}")
+    print("-" * 52)
+    for name, method in methods:
+        start = time.perf_counter()
+        results = [method(b) for b in exponents]
+        elapsed = time.perf_counter() - start
+        if results != expected:
+            raise ValueError(f"{name} returned a wrong result")
+        print(f"{name:<32}{elapsed / nr_exponents:<20.6f}")
+    print(f"{'fixed base precomputation':<32}{precomputation_time:<20.6f}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="""Modular exponentiation benchmarks
+
+Commands:
+  benchmark           Binary, sliding window and fixed-base exponentiation against the built-in pow
+                      Parameters:
+                        -k: Number of bits of modulus and exponents (default: 1024)
+                        -n: Number of exponents (default: 20)
+                      Example: python3 modexp.py benchmark -k 2048
+
+  multi_pow_benchmark Simultaneous multi-exponentiation against a product of pow, for 2 to 8 bases
+                      Parameters:
+                        -k: Number of bits of modulus and exponents (default: 1024)
+                        -n: Number of products per number of bases (default: 5)
+                      Example: python3 modexp.py multi_pow_benchmark -k 1024
+""",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    parser_benchmark = subparsers.add_parser("benchmark", help="Exponentiation methods benchmark")
+    parser_benchmark.add_argument('-k', type=int, default=1024, help='Number of bits of modulus and exponents')
+    parser_benchmark.add_argument('-n', type=int, default=20, help='Number of exponents')
+
+    parser_multi_pow = subparsers.add_parser("multi_pow_benchmark", help="Multi-exponentiation benchmark")
+    parser_multi_pow.add_argument('-k', type=int, default=1024, help='Number of bits of modulus and exponents')
+    parser_multi_pow.add_argument('-n', type=int, default=5, help='Number of products per number of bases')
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+    elif args.command == "benchmark":
+        benchmark(args.k, args.n)
+    elif args.command == "multi_pow_benchmark":
+        benchmark_multi_pow(args.k, args.n)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,20 @@
+import argparse
+import math
+import random
+import time
 
-a = 5
-b = 13
+# Algoritmo di Euclide esteso: egcd(a, b) = (g, x, y) con a * x + b * y = g
+# - egcd: versione classica, una divisione tra numeri grandi per ogni passo
+# - lehmer_egcd: versione di Lehmer per operandi di migliaia di bit, i quozienti
+#   si calcolano sulle cifre più significative e si applicano a blocchi
+# - batch_inverse: trucco di Montgomery, N inversi modulo m con una sola
+#   inversione e 3(N - 1) moltiplicazioni
 
 def egcd(a, b):
-    x = 0    
-    u = 1    
+    x = 0
+    u = 1
     y = 1
-    v = 0    
+    v = 0
     while a != 0:
         q = b // a
         r = b % a
@@ -21,4 +29,100 @@ def egcd(a, b):
     gcd = b
     return gcd, x, y
 
-print(egcd(a, b))
\ No newline at end of file
+# number of leading bits used for the single-precision quotient steps
+LEHMER_DIGIT_BITS = 62
+
+def lehmer_egcd(a, b):
+    # Knuth's Algorithm L, extended with the cofactors. Same result as egcd for a, b >= 0;
+    # negative operands (only small ones in practice) go to egcd, which handles their signs
+    if a < 0 or b < 0:
+        return egcd(a, b)
+    swap = a < b
+    if swap:
+        a, b = b, a
+    # a = ua * a0 + va * b0, b = ub * a0 + vb * b0
+    ua, va, ub, vb = 1, 0, 0, 1
+    while b >> LEHMER_DIGIT_BITS:
+        shift = a.bit_length() - LEHMER_DIGIT_BITS
+        ah = a >> shift
+        bh = b >> shift
+        A, B, C, D = 1, 0, 0, 1
+        while bh + C != 0 and bh + D != 0:
+            q = (ah + A) // (bh + C)
+            if q != (ah + B) // (bh + D):
+                break
+            A, C = C, A - q * C
+            B, D = D, B - q * D
+            ah, bh = bh, ah - q * bh
+        if B == 0:
+            # the leading digits were not enough: one full-precision step
+            q, r = divmod(a, b)
+            a, b = b, r
+            ua, ub = ub, ua - q * ub
+            va, vb = vb, va - q * vb
+        else:
+            a, b = A * a + B * b, C * a + D * b
+            ua, ub = A * ua + B * ub, C * ua + D * ub
+            va, vb = A * va + B * vb, C * va + D * vb
+    while b:
+        q, r = divmod(a, b)
+        a, b = b, r
+        ua, ub = ub, ua - q * ub
+        va, vb = vb, va - q * vb
+    if swap:
+        ua, va = va, ua
+    return a, ua, va
+
+def batch_inverse(values, m):
+    # prefix[i] = values[0] * ... * values[i] mod m, a single inversion of the
+    # full product, then walking back inverse(values[i]) = prefix[i-1] * inverse(prefix[i])
+    if not values:
+        return []
+    prefix = [values[0] % m]
+    for value in values[1:]:
+        prefix.append(prefix[-1] * value % m)
+    gcd, inverse, _ = lehmer_egcd(prefix[-1], m)
+    if gcd != 1:
+        raise ValueError("Some value is not invertible modulo m")
+    inverse %= m
+    inverses = [0] * len(values)
+    for i in range(len(values) - 1, 0, -1):
+        inverses[i] = prefix[i - 1] * inverse % m
+        inverse = inverse * values[i] % m
+    inverses[0] = inverse
+    return inverses
+
+def benchmark(bits=4096, nr_tests=20, nr_inverses=1000):
+    pairs = [(random.getrandbits(bits), random.getrandbits(bits)) for _ in range(nr_tests)]
+    for name, function in [("egcd", egcd), ("lehmer_egcd", lehmer_egcd)]:
+        start = time.perf_counter()
+        for a, b in pairs:
+            function(a, b)
+        print(f"{name} average time ({bits} bits): ", (time.perf_counter() - start) / nr_tests)
+
+    m = random.getrandbits(bits) | (1 << (bits - 1)) | 1
+    values = [random.randrange(1, m) for _ in range(nr_inverses)]
+    values = [value for value in values if math.gcd(value, m) == 1]
+    start = time.perf_counter()
+    expected = [pow(value, -1, m) for value in values]
+    print(f"pow(x, -1, m) time for {len(values)} inverses: ", time.perf_counter() - start)
+    start = time.perf_counter()
+    inverses = batch_inverse(values, m)
+    print(f"batch_inverse time for {len(values)} inverses: ", time.perf_counter() - start)
+    if inverses != expected:
+        raise ValueError("batch_inverse returned a wrong result")
+
+def main():
+    parser = argparse.ArgumentParser(description="Extended Euclidean algorithm: a * x + b * y = gcd(a, b)")
+    parser.add_argument('-a', type=int, default=5, help='First integer (default: 5)')
+    parser.add_argument('-b', type=int, default=13, help='Second integer (default: 13)')
+    parser.add_argument('--benchmark', action='store_true', help='Compare egcd, lehmer_egcd and batch_inverse on 4096-bit operands')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    else:
+        print(egcd(args.a, args.b))
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,91 @@
 import random
 import MillerRabin
+import primality
 
-def generate_prime(k, rounds=40):
+def is_probable_prime(n, rounds=40, method="miller_rabin"):
+    # method: "miller_rabin" (rounds random witnesses) or "deterministic"
+    # (fixed witnesses below 2^64, Baillie-PSW above, see primality.py)
+    if method == "deterministic":
+        return primality.is_prime(n)
+    return MillerRabin.miller_rabin(n, rounds)
+
+def small_primes(limit):
+    # Crivello di Eratostene: tutti i primi dispari <= limit
+    sieve = bytearray([1]) * (limit + 1)
+    sieve[0:2] = b'\x00\x00'
+    for i in range(2, int(limit ** 0.5) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytes(len(range(i * i, limit + 1, i)))
+    return [i for i in range(3, limit + 1) if sieve[i]]
+
+# primes up to 17863 are the first 2048 primes (2 excluded, candidates are always odd)
+SIEVE_PRIMES = small_primes(17863)
+SIEVE_WINDOW = 4096
+
+def generate_prime(k, rounds=40, sieve=False, stats=None, stop=None, method="miller_rabin"):
+    # stats, if given, is a dict updated with the number of candidates
+    # rejected by trial division ("sieved") and sent to the primality test ("tested")
+    # stop, if given, is an event checked before every primality test:
+    # once it is set the search gives up and returns None
+    if stats is None:
+        stats = {}
+    stats.setdefault("sieved", 0)
+    stats.setdefault("tested", 0)
     if k < 2:
         return None
-    while True:
+    if sieve and k > 2:
+        return generate_prime_sieved(k, rounds, stats, stop, method)
+    while stop is None or not stop.is_set():
         number = generate_k_bit_number(k)
-        if MillerRabin.miller_rabin(number, rounds):
+        stats["tested"] += 1
+        if is_probable_prime(number, rounds, method):
             return number
-        
+    return None
+
+def sieved_candidates(k, stats, targets=None):
+    # Incremental search: start from a random odd k-bit base and walk through
+    # base, base + 2, base + 4, ... one window at a time. The residues of the
+    # base modulo the small primes are computed once and then advanced by
+    # 2 * SIEVE_WINDOW per window, so the sieve never divides a big number again.
+    # Yields the candidates with no residue in targets(p) modulo any small prime
+    # p (by default targets(p) = (0,): no small factor), every rejected one is
+    # counted in stats["sieved"]. Only small primes below 2^(k-1) are used, so a
+    # zero residue always means composite.
+    primes = [p for p in SIEVE_PRIMES if p < (1 << (k - 1))]
+    prime_targets = [targets(p) if targets is not None else (0,) for p in primes]
+    limit = 1 << k
+    while True:
+        base = generate_k_bit_number(k)
+        residues = [base % p for p in primes]
+        while base < limit:
+            # marks[j] == 1 <=> base + 2j has no residue in the targets
+            marks = bytearray([1]) * SIEVE_WINDOW
+            for p, residue, p_targets in zip(primes, residues, prime_targets):
+                for target in p_targets:
+                    # base + 2j = target (mod p)  <=>  j = (target - base) * 2^-1 (mod p)
+                    j = ((target - residue) * ((p + 1) // 2)) % p
+                    if j < SIEVE_WINDOW:
+                        marks[j::p] = bytes(len(range(j, SIEVE_WINDOW, p)))
+            for j in range(SIEVE_WINDOW):
+                candidate = base + 2 * j
+                if candidate >= limit:
+                    break
+                if not marks[j]:
+                    stats["sieved"] += 1
+                    continue
+                yield candidate
+            base += 2 * SIEVE_WINDOW
+            residues = [(r + 2 * SIEVE_WINDOW) % p for r, p in zip(residues, primes)]
+        # the window ran past 2^k: restart from a fresh random base
+
+def generate_prime_sieved(k, rounds, stats, stop=None, method="miller_rabin"):
+    for candidate in sieved_candidates(k, stats):
+        if stop is not None and stop.is_set():
+            return None
+        stats["tested"] += 1
+        if is_probable_prime(candidate, rounds, method):
+            return candidate
+
 
 def generate_k_bit_number(k):
     # Generate a random number with k-2 bits (between 0 and 2^(k-2) - 1)
@@ -0,0 +1,106 @@
+import math
+
+# Test di primalità deterministico:
+# - n < 2^64: Miller-Rabin con un insieme fisso di basi, che non ha pseudoprimi forti sotto 2^64
+# - n >= 2^64: Baillie-PSW, un test forte in base 2 seguito da un test di Lucas forte
+# Non sono noti pseudoprimi di Baillie-PSW: per candidati grandi sostituisce
+# i 40 round di Miller-Rabin con circa tre esponenziazioni modulari.
+
+SMALL_PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97]
+
+# the first 12 primes are a witness set for every n < 3.3 * 10^24, so in particular below 2^64
+DETERMINISTIC_BASES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37]
+
+def decompose(n):
+    # n - 1 = 2^s * d con d dispari
+    s, d = 0, n - 1
+    while d % 2 == 0:
+        s += 1
+        d //= 2
+    return s, d
+
+def is_strong_probable_prime(n, a, s, d):
+    x = pow(a, d, n)
+    if x == 1 or x == n - 1:
+        return True
+    for _ in range(s - 1):
+        x = x * x % n
+        if x == n - 1:
+            return True
+    return False
+
+def jacobi(a, n):
+    # simbolo di Jacobi (a/n) per n dispari positivo
+    a %= n
+    result = 1
+    while a != 0:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+def selfridge_parameters(n):
+    # Metodo A di Selfridge: primo D in 5, -7, 9, -11, ... con (D/n) = -1, P = 1, Q = (1 - D) / 4
+    D = 5
+    while True:
+        j = jacobi(D, n)
+        if j == -1:
+            return D, 1, (1 - D) // 4
+        if j == 0 and abs(D) != n:
+            return None
+        D = -D - 2 if D > 0 else -D + 2
+
+def is_strong_lucas_probable_prime(n):
+    # n dispari, non quadrato perfetto
+    parameters = selfridge_parameters(n)
+    if parameters is None:
+        return False
+    D, P, Q = parameters
+
+    # n + 1 = 2^s * d con d dispari
+    s, d = 0, n + 1
+    while d % 2 == 0:
+        s += 1
+        d //= 2
+
+    def half(x):
+        # x / 2 mod n (n è dispari)
+        return (x + n) // 2 % n if x % 2 else x // 2 % n
+
+    # U_1 = 1, V_1 = P, Q^1 = Q, poi i bit di d da sinistra a destra
+    U, V, Qk = 1, P, Q % n
+    for bit in bin(d)[3:]:
+        U, V = U * V % n, (V * V - 2 * Qk) % n
+        Qk = Qk * Qk % n
+        if bit == '1':
+            U, V = half(P * U + V), half(D * U + P * V)
+            Qk = Qk * Q % n
+
+    if U == 0 or V == 0:
+        return True
+    for _ in range(s - 1):
+        V = (V * V - 2 * Qk) % n
+        if V == 0:
+            return True
+        Qk = Qk * Qk % n
+    return False
+
+def is_prime(n):
+    if n < 2:
+        return False
+    for p in SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+    s, d = decompose(n)
+    if n < 1 << 64:
+        return all(is_strong_probable_prime(n, a, s, d) for a in DETERMINISTIC_BASES)
+    if not is_strong_probable_prime(n, 2, s, d):
+        return False
+    if math.isqrt(n) ** 2 == n:
+        return False
+    return is_strong_lucas_probable_prime(n)
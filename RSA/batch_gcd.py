@@ -0,0 +1,135 @@
+import argparse
+import math
+import random
+import time
+import rsa
+
+# Batch GCD (Bernstein): finds every modulus that shares a prime with some other
+# modulus in the collection, in quasi-linear time instead of N^2 / 2 gcds.
+# 1. product tree: the leaves are the moduli, every node is the product of its children
+# 2. remainder tree: P mod n_i^2 for every leaf, going down from the root P = n_1 * ... * n_N
+# 3. gcd(n_i, (P mod n_i^2) / n_i) = gcd(n_i, product of the other moduli)
+
+def product_tree(values):
+    tree = [list(values)]
+    while len(tree[-1]) > 1:
+        level = tree[-1]
+        tree.append([level[i] * level[i + 1] if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)])
+    return tree
+
+def remainder_tree(tree):
+    # remainders[i] = P mod n_i^2
+    remainders = tree[-1]
+    for level in reversed(tree[:-1]):
+        remainders = [remainders[i // 2] % (value * value) for i, value in enumerate(level)]
+    return remainders
+
+def batch_gcd(moduli):
+    if not moduli:
+        return []
+    tree = product_tree(moduli)
+    remainders = remainder_tree(tree)
+    return [math.gcd(r // n, n) for r, n in zip(remainders, moduli)]
+
+def find_shared_primes(moduli):
+    # returns a list of (i, j, p): moduli[i] and moduli[j] are both divisible by p
+    gcds = batch_gcd(moduli)
+    weak = [i for i, g in enumerate(gcds) if g != 1]
+    # only the (few) weak moduli are compared pairwise, this also handles the
+    # case gcd == n_i where both primes of n_i are shared with other moduli
+    pairs = []
+    for a in range(len(weak)):
+        for b in range(a + 1, len(weak)):
+            i, j = weak[a], weak[b]
+            g = math.gcd(moduli[i], moduli[j])
+            if g != 1:
+                pairs.append((i, j, g))
+    return pairs
+
+def read_moduli(file):
+    # one modulus per line, decimal or 0x-prefixed hexadecimal, blank lines and '#' comments are skipped
+    for line in file:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield int(line, 0)
+
+def generate_moduli(nr_keys, prime_length, nr_shared):
+    # nr_keys moduli, nr_shared of them reuse the first prime of another modulus
+    primes = [rsa.generate_prime(prime_length, sieve=True, method="deterministic") for _ in range(2 * nr_keys - nr_shared)]
+    moduli = [primes[2 * i] * primes[2 * i + 1] for i in range(nr_keys - nr_shared)]
+    planted = []
+    for k in range(nr_shared):
+        i = random.randrange(len(moduli))
+        planted.append((i, len(moduli), primes[2 * i]))
+        moduli.append(primes[2 * i] * primes[2 * (nr_keys - nr_shared) + k])
+    return moduli, planted
+
+def benchmark(nr_keys=2000, prime_length=256, nr_shared=10, naive=True):
+    start = time.perf_counter()
+    moduli, planted = generate_moduli(nr_keys, prime_length, nr_shared)
+    print(f"Generated {nr_keys} moduli of {2 * prime_length} bits ({nr_shared} sharing a prime) in {time.perf_counter() - start:.3f} s")
+
+    start = time.perf_counter()
+    pairs = find_shared_primes(moduli)
+    print(f"Batch GCD time: {time.perf_counter() - start:.3f} s, pairs found: {len(pairs)}")
+    found = {(i, j) for i, j, _ in pairs}
+    missing = [(i, j) for i, j, _ in planted if (i, j) not in found]
+    if missing:
+        raise ValueError(f"Batch GCD missed the planted pairs {missing}")
+
+    if naive:
+        start = time.perf_counter()
+        naive_pairs = [(i, j) for i in range(len(moduli)) for j in range(i + 1, len(moduli)) if math.gcd(moduli[i], moduli[j]) != 1]
+        print(f"Pairwise GCD time: {time.perf_counter() - start:.3f} s, pairs found: {len(naive_pairs)}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="""Batch GCD: find RSA moduli that share a prime factor
+
+Commands:
+  scan                Scan a file of moduli
+                      Parameters:
+                        -f: File with one modulus per line (decimal or 0x hexadecimal)
+                      Output: every pair of moduli (line indices) sharing a prime, with the prime
+                      Example: python3 batch_gcd.py scan -f moduli.txt
+
+  benchmark           Batch GCD on synthetic keys, some of them sharing a prime
+                      Parameters:
+                        -n: Number of moduli (default: 2000)
+                        -k: Number of bits of each prime (default: 256)
+                        -s: Number of moduli sharing a prime with another modulus (default: 10)
+                        --no-naive: Skip the pairwise gcd comparison
+                      Output: generation time, batch GCD time, pairwise GCD time
+                      Example: python3 batch_gcd.py benchmark -n 5000 -k 256
+""",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    parser_scan = subparsers.add_parser("scan", help="Scan a file of moduli")
+    parser_scan.add_argument("-f", type=str, required=True, help="File with one modulus per line")
+
+    parser_benchmark = subparsers.add_parser("benchmark", help="Batch GCD on synthetic keys")
+    parser_benchmark.add_argument("-n", type=int, default=2000, help="Number of moduli")
+    parser_benchmark.add_argument("-k", type=int, default=256, help="Number of bits of each prime")
+    parser_benchmark.add_argument("-s", type=int, default=10, help="Number of moduli sharing a prime")
+    parser_benchmark.add_argument("--no-naive", action="store_true", help="Skip the pairwise gcd comparison")
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+    elif args.command == "scan":
+        with open(args.f, 'r') as file:
+            moduli = list(read_moduli(file))
+        start = time.perf_counter()
+        pairs = find_shared_primes(moduli)
+        elapsed = time.perf_counter() - start
+        for i, j, p in pairs:
+            print(f"moduli {i} and {j} share the prime {p}")
+        print(f"Scanned {len(moduli)} moduli in {elapsed:.3f} s, {len(pairs)} pairs share a prime")
+    elif args.command == "benchmark":
+        benchmark(args.n, args.k, args.s, not args.no_naive)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import argparse
+import functools
+import math
+import random
+import time
+
+import rsa
+import search_pool
+# rsa has put the MillerRabin folder on sys.path
+from PrimeGen import small_primes
+
+# General-purpose factoring for moduli with a small factor (weak-key audits):
+#  - Pollard's p-1 finds p when p - 1 is B1-smooth (stage 1), or B1-smooth
+#    except for one prime <= B2 (stage 2);
+#  - Brent's rho finds p in about sqrt(p) steps whatever p is, the gcd with n
+#    is taken once every m steps on the product of the differences.
+# FactoringPool runs p-1 and several rho walks with independent random starts
+# in a pool of processes, the first one to find a factor stops the others.
+
+DEFAULT_B1 = 100000
+DEFAULT_B2 = 5000000
+RHO_BATCH = 128
+
+@functools.lru_cache(maxsize=8)
+def stage1_exponent(B1):
+    # product of the largest power <= B1 of every prime <= B1
+    exponent = 1 << (B1.bit_length() - 1)
+    for p in small_primes(B1):
+        power = p
+        while power * p <= B1:
+            power *= p
+        exponent *= power
+    return exponent
+
+@functools.lru_cache(maxsize=8)
+def stage2_primes(B1, B2):
+    return [p for p in small_primes(B2) if p > B1]
+
+def pollard_p_minus_1(n, B1=DEFAULT_B1, B2=DEFAULT_B2, a=2, stop=None):
+    # a non-trivial factor of n, or None
+    x = pow(a, stage1_exponent(B1), n)
+    g = math.gcd(x - 1, n)
+    if 1 < g < n:
+        return g
+    if g == n or B2 <= B1:
+        # every prime factor (or none) has a B1-smooth p - 1 for this base
+        return None
+
+    # stage 2: x^q for consecutive primes q, the steps x^(gap) are cached
+    primes = stage2_primes(B1, B2)
+    if not primes:
+        return None
+    steps = {}
+    y = pow(x, primes[0], n)
+    accumulator = (y - 1) % n
+    previous = primes[0]
+    for i, q in enumerate(primes[1:], 1):
+        gap = q - previous
+        step = steps.get(gap)
+        if step is None:
+            step = steps[gap] = pow(x, gap, n)
+        y = y * step % n
+        accumulator = accumulator * (y - 1) % n
+        previous = q
+        if i % 1024 == 0:
+            g = math.gcd(accumulator, n)
+            if g != 1:
+                break
+            if stop is not None and stop.is_set():
+                return None
+    g = math.gcd(accumulator, n)
+    return g if 1 < g < n else None
+
+def brent_rho(n, c=None, y=None, m=RHO_BATCH, stop=None):
+    # a non-trivial factor of n with the walk y -> y^2 + c, or None if the walk
+    # fails (try another c) or stop is set
+    if n % 2 == 0:
+        return 2
+    c = c if c is not None else random.randint(1, n - 3)
+    y = y if y is not None else random.randint(0, n - 1)
+    # r doubles at every round: the stop event is checked every m steps, not once per round
+    stopped = lambda: stop is not None and stop.is_set()
+    g = r = q = 1
+    while g == 1:
+        x = y
+        for k in range(0, r, m):
+            for _ in range(min(m, r - k)):
+                y = (y * y + c) % n
+            if stopped():
+                return None
+        k = 0
+        while k < r and g == 1:
+            ys = y
+            for _ in range(min(m, r - k)):
+                y = (y * y + c) % n
+                q = q * abs(x - y) % n
+            g = math.gcd(q, n)
+            k += m
+            if g == 1 and stopped():
+                return None
+        r *= 2
+    if g == n:
+        # the batch overshot: redo its steps one gcd at a time
+        while True:
+            ys = (ys * ys + c) % n
+            g = math.gcd(abs(x - ys), n)
+            if g > 1:
+                break
+    return g if g < n else None
+
+def _rho_worker(n):
+    return "rho", brent_rho(n, stop=search_pool.worker_stop_event())
+
+def _p_minus_1_worker(n, B1, B2):
+    return "p-1", pollard_p_minus_1(n, B1, B2, random.randint(2, n - 2), search_pool.worker_stop_event())
+
+class FactoringPool(search_pool.SearchPool):
+    def __init__(self, workers=None, B1=DEFAULT_B1, B2=DEFAULT_B2):
+        super().__init__(workers)
+        self.B1 = B1
+        self.B2 = B2
+
+    def find_factor(self, n, stats=None):
+        # a non-trivial factor of the composite n, stats counts the wins of every method
+        if n % 2 == 0:
+            return 2
+
+        def start():
+            # one p-1 attempt (cheap when it works) and a rho walk for every worker;
+            # with a single worker p-1 runs first
+            return [self.submit(_p_minus_1_worker, n, self.B1, self.B2)] + [self.submit(_rho_worker, n) for _ in range(self.workers)]
+
+        def on_done(future, pending):
+            method, result = future.result()
+            if result is None:
+                if method == "rho":
+                    # failed walk: start another one with a new c
+                    pending.add(self.submit(_rho_worker, n))
+                return None
+            return method, result
+
+        (method, factor), _ = self.first_result(start, on_done)
+        if stats is not None:
+            stats[method] = stats.get(method, 0) + 1
+        return factor
+
+    def factorize(self, n, rounds=40):
+        # prime factors of n, sorted
+        factors = []
+        composites = [n]
+        while composites:
+            m = composites.pop()
+            if m == 1:
+                continue
+            if rsa.miller_rabin(m, rounds):
+                factors.append(m)
+                continue
+            root = math.isqrt(m)
+            factor = root if root * root == m else self.find_factor(m)
+            composites += [factor, m // factor]
+        return sorted(factors)
+
+def benchmark(factor_sizes=(24, 32, 40, 48), cofactor_size=512, nr_tests=5, workers=None, B1=DEFAULT_B1, B2=DEFAULT_B2):
+    # n = p * q with a small prime p of every size and a cofactor_size-bit prime q
+    print(f"{'Factor bits':<15}{'Tests':<10}{'Mean (s)':<15}{'p50 (s)':<15}{'Max (s)':<15}{'Wins p-1 / rho':<15}")
+    print("-" * 85)
+    with FactoringPool(workers, B1, B2) as pool:
+        for bits in factor_sizes:
+            times = []
+            stats = {}
+            for _ in range(nr_tests):
+                p = rsa.generate_prime(bits, sieve=True)
+                q = rsa.generate_prime(cofactor_size, sieve=True)
+                n = p * q
+                start = time.perf_counter()
+                factor = pool.find_factor(n, stats)
+                times.append(time.perf_counter() - start)
+                if factor not in (p, q):
+                    raise ValueError("find_factor returned a wrong factor")
+            times.sort()
+            wins = f"{stats.get('p-1', 0)} / {stats.get('rho', 0)}"
+            print(f"{bits:<15}{nr_tests:<10}{sum(times) / len(times):<15.4f}{rsa.percentile(times, 50):<15.4f}{times[-1]:<15.4f}{wins:<15}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="""Factoring with Pollard's p-1 and Brent's rho
+
+Commands:
+  factor              Factor an integer
+                      Parameters:
+                        -n: Integer to factor (decimal or 0x hexadecimal)
+                        --workers: Number of worker processes (default: number of cores)
+                        --B1, --B2: Bounds of the p-1 stages (default: 100000, 5000000)
+                      Output: the prime factors of n
+                      Example: python3 factoring.py factor -n 1000000016000000063
+
+  benchmark           Time to factor n = p * q with a small prime p
+                      Parameters:
+                        -s: Sizes (bits) of p, one or more values (default: 24 32 40 48)
+                        -k: Size (bits) of q (default: 512)
+                        -n: Number of tests per size (default: 5)
+                        --workers, --B1, --B2: as above
+                      Output: mean, median and max time to factor, wins of every method
+                      Example: python3 factoring.py benchmark -s 32 40 48 56 -n 10
+""",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    def add_pool_arguments(subparser):
+        subparser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+        subparser.add_argument("--B1", type=int, default=DEFAULT_B1, help="Bound of p-1 stage 1")
+        subparser.add_argument("--B2", type=int, default=DEFAULT_B2, help="Bound of p-1 stage 2")
+
+    parser_factor = subparsers.add_parser("factor", help="Factor an integer")
+    parser_factor.add_argument("-n", type=lambda value: int(value, 0), required=True, help="Integer to factor")
+    add_pool_arguments(parser_factor)
+
+    parser_benchmark = subparsers.add_parser("benchmark", help="Time to factor across factor sizes")
+    parser_benchmark.add_argument("-s", type=int, nargs="+", default=[24, 32, 40, 48], help="Sizes (bits) of the small factor")
+    parser_benchmark.add_argument("-k", type=int, default=512, help="Size (bits) of the cofactor")
+    parser_benchmark.add_argument("-n", type=int, default=5, help="Number of tests per size")
+    add_pool_arguments(parser_benchmark)
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+    elif args.command == "factor":
+        start = time.perf_counter()
+        with FactoringPool(args.workers, args.B1, args.B2) as pool:
+            factors = pool.factorize(args.n)
+        print(" * ".join(map(str, factors)))
+        print(f"Factored in {time.perf_counter() - start:.3f} s")
+    elif args.command == "benchmark":
+        benchmark(args.s, args.k, args.n, args.workers, args.B1, args.B2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import mmap
+import struct
+
+import rsa_keys
+
+# Keystore file format (all integers big-endian):
+#   magic        8 bytes   b"RSAKEYS1"
+#   count        uint32    number of keys
+#   index        count * uint64, offset of every key record from the start of the file
+#   records      for every key the fields n, e, d, p, q, dp, dq, qinv,
+#                each one as a uint32 length followed by the bytes of the integer
+# The index lets a key be read without parsing the keys before it, and the file
+# is memory-mapped so that opening a store does not read it.
+
+MAGIC = b"RSAKEYS1"
+FIELDS = ("n", "e", "d", "p", "q", "dp", "dq", "qinv")
+HEADER = struct.Struct(">8sI")
+OFFSET = struct.Struct(">Q")
+LENGTH = struct.Struct(">I")
+
+def encode_key(key):
+    record = bytearray()
+    for field in FIELDS:
+        value = getattr(key, field)
+        data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+        record += LENGTH.pack(len(data))
+        record += data
+    return bytes(record)
+
+def write_keystore(path, keys):
+    records = [encode_key(key) for key in keys]
+    offset = HEADER.size + OFFSET.size * len(records)
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(records)))
+        for record in records:
+            file.write(OFFSET.pack(offset))
+            offset += len(record)
+        for record in records:
+            file.write(record)
+
+class KeyStore:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a keystore file")
+
+    def __len__(self):
+        return self.count
+
+    def _read_fields(self, i, nr_fields=len(FIELDS)):
+        if not 0 <= i < self.count:
+            raise IndexError("keystore index out of range")
+        offset, = OFFSET.unpack_from(self.data, HEADER.size + OFFSET.size * i)
+        values = []
+        for _ in range(nr_fields):
+            length, = LENGTH.unpack_from(self.data, offset)
+            offset += LENGTH.size
+            values.append(int.from_bytes(self.data[offset:offset + length], 'big'))
+            offset += length
+        return values
+
+    def __getitem__(self, i):
+        return rsa_keys.RSAPrivateKey.from_parameters(*self._read_fields(i))
+
+    def public_key(self, i):
+        # n and e are the first two fields, the rest of the record is not read
+        n, e = self._read_fields(i, 2)
+        return rsa_keys.RSAPublicKey(n, e)
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def load_key(path, i=0):
+    with KeyStore(path) as store:
+        return store[i]
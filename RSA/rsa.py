@@ -1,25 +1,20 @@
+import os
+import sys
+import math
 import random
 import time
 import argparse
 
-def egcd(a, b):
-    x = 0    
-    u = 1    
-    y = 1
-    v = 0    
-    while a != 0:
-        q = b // a
-        r = b % a
-        s = x - q * u
-        t = y - q * v
-        b = a
-        a = r
-        x = u
-        y = v
-        u = s
-        v = t
-    gcd = b
-    return gcd, x, y
+MODULAR_ARITHMETIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ModularArithmetic')
+sys.path.append(os.path.join(MODULAR_ARITHMETIC_DIR, 'MillerRabin'))
+sys.path.append(os.path.join(MODULAR_ARITHMETIC_DIR, 'EsponenziazioneVeloce'))
+sys.path.append(os.path.join(MODULAR_ARITHMETIC_DIR, 'ExtendedEuclid'))
+import primality
+import modexp
+from egcd import egcd, lehmer_egcd
+import search_pool
+# one implementation of the sieved prime search, shared with the MillerRabin folder
+from PrimeGen import is_probable_prime, generate_prime, sieved_candidates
 
 def binary_modular_exponentiation(a, b, m):
     result = 1
@@ -68,40 +63,119 @@ def miller_rabin(n, k=5):
             return False  # Sicuramente composto
     return True  # Probabilmente primo
 
-
-def generate_prime(k, rounds=40):
-    if k < 2:
+def generate_safe_prime(k, rounds=40, stats=None, method="miller_rabin"):
+    # Safe prime p = 2q + 1 with q prime. The (k-1)-bit candidates q come from
+    # the same sieved walk as generate_prime, but the sieve rejects q when either
+    # q or 2q + 1 has a small factor: q = 0 (mod s) or q = (s - 1) / 2 (mod s).
+    # Before the full tests, one base-2 Fermat test on q and one on p throw away
+    # almost all composites.
+    if stats is None:
+        stats = {}
+    stats.setdefault("sieved", 0)
+    stats.setdefault("tested", 0)
+    if k < 3:
+        return None
+    if k == 3:
+        return 5 if random.randint(0, 1) else 7
+    for q in sieved_candidates(k - 1, stats, lambda s: (0, (s - 1) // 2)):
+        stats["tested"] += 1
+        p = 2 * q + 1
+        if pow(2, q - 1, q) != 1 or pow(2, 2 * q, p) != 1:
+            continue
+        if is_probable_prime(q, rounds, method) and is_probable_prime(p, rounds, method):
+            return p
+
+def generate_strong_prime(k, rounds=40, stats=None, method="miller_rabin"):
+    # Gordon's algorithm: p - 1 has the large prime factor r, p + 1 has the
+    # large prime factor s, and r - 1 has the large prime factor t
+    if stats is None:
+        stats = {}
+    stats.setdefault("sieved", 0)
+    stats.setdefault("tested", 0)
+    if k < 32:
         return None
     while True:
-        number = generate_k_bit_number(k)
-        if miller_rabin(number, rounds):
-            return number
-        
-
-def generate_k_bit_number(k):
-    # Generate a random number with k-2 bits (between 0 and 2^(k-2) - 1)
-    # This will be the middle bits of the k-bit number
-    # The MSB and LSB will be set to 1
-    # k = 5, k-2 = 3, so the number should be between 000 and 111: 0, 1, 2, 3, 4, 5, 6, 7, random.randint(0, 7)
-    # 7 = 111 = 2^3 - 1 where 3 is k-2
-    middle_bits = random.randint(0, (1 << (k - 2)) - 1)
-    
-    n = (1 << (k - 1)) | middle_bits | 1
-    
-    return n
+        s = generate_prime(k // 2 - 2, rounds, True, stats, method=method)
+        t = generate_prime(k // 2 - 4, rounds, True, stats, method=method)
+        # r = 2it + 1
+        i = 1
+        while True:
+            r = 2 * i * t + 1
+            stats["tested"] += 1
+            if is_probable_prime(r, rounds, method):
+                break
+            i += 1
+        # p0 = 2 (s^(r-2) mod r) s - 1 satisfies p0 = 1 (mod r) and p0 = -1 (mod s)
+        p0 = 2 * pow(s, r - 2, r) * s - 1
+        step = 2 * r * s
+        # first p = p0 + j * step with k bits
+        p = p0 + max(0, -(-((1 << (k - 1)) - p0) // step)) * step
+        while p < (1 << k):
+            stats["tested"] += 1
+            if is_probable_prime(p, rounds, method):
+                return p
+            p += step
+
+# Parallel prime search: every worker runs its own search loop, the first one
+# that finds a prime sets the shared stop event and the others give up
+def _search_prime_worker(k, rounds, sieve, method):
+    stats = {}
+    prime = generate_prime(k, rounds, sieve, stats, search_pool.worker_stop_event(), method)
+    return prime, stats
+
+class PrimeSearchPool(search_pool.SearchPool):
+    def generate_prime(self, k, rounds=40, sieve=True, stats=None, method="miller_rabin"):
+        if k < 2:
+            return None
+
+        def on_done(future, pending):
+            prime, worker_stats = future.result()
+            _merge_stats(stats, worker_stats)
+            return prime
+
+        prime, pending = self.first_result(lambda: [self.submit(_search_prime_worker, k, rounds, sieve, method) for _ in range(self.workers)], on_done)
+        # the workers that were still running stopped before their next Miller-Rabin test
+        for future in pending:
+            if not future.cancelled():
+                _merge_stats(stats, future.result()[1])
+        return prime
+
+    def generate_key(self, k, rounds=40, sieve=True, stats=None, method="miller_rabin"):
+        p = self.generate_prime(k, rounds, sieve, stats, method)
+        q = self.generate_prime(k, rounds, sieve, stats, method)
+        while q == p:
+            q = self.generate_prime(k, rounds, sieve, stats, method)
+        e, d, n = generate_key(p, q)
+        return p, q, e, d, n
+
+def _merge_stats(stats, worker_stats):
+    if stats is not None:
+        for key, value in worker_stats.items():
+            stats[key] = stats.get(key, 0) + value
+
+def generate_prime_parallel(k, workers=None, rounds=40, sieve=True, stats=None, method="miller_rabin"):
+    with PrimeSearchPool(workers) as pool:
+        return pool.generate_prime(k, rounds, sieve, stats, method)
+
+def generate_keys_parallel(nr_keys, k, workers=None, rounds=40, sieve=True, stats=None, method="miller_rabin"):
+    # returns a list of (p, q, e, d, n), the pool is shared by all the keys
+    with PrimeSearchPool(workers) as pool:
+        return [pool.generate_key(k, rounds, sieve, stats, method) for _ in range(nr_keys)]
+
 
 def generate_key(p, q):
     n = p*q
     phi = (p-1)*(q-1)
 
     e = random.randint(2, phi-1)
-    egcd_result = egcd(e, phi)
+    egcd_result = lehmer_egcd(e, phi)
 
     while egcd_result[0] != 1:
         e = random.randint(2, phi-1)
-        egcd_result = egcd(e, phi)
+        egcd_result = lehmer_egcd(e, phi)
 
-    d = pow(e, -1, phi)   
+    # e * x + phi * y = 1, so x is already the inverse of e modulo phi
+    d = egcd_result[1] % phi
     return (e, d, n)
 
 def generate_crt_key(d, p, q):
@@ -125,17 +199,119 @@ def rsa_decrypt_crt(c, p, q, dp, dq, qinv):
     h = (qinv * (m1 - m2)) % p
     return m2 + h*q
 
-def test_rsa_times():
+# Multi-prime RSA: n = p_1 * ... * p_r, the private key operation is done
+# modulo each p_i (primes of 1/r of the modulus size) and recombined with
+# Garner's algorithm
+def generate_multiprime_primes(modulus_length, nr_primes, sieve=True, method="deterministic"):
+    # nr_primes distinct primes whose product has exactly modulus_length bits.
+    # The first nr_primes - 1 primes share the bits evenly (the leftover bits
+    # of modulus_length // nr_primes go one each to the first primes), the last
+    # one takes the remaining bits: it must be in [low, 2 * low) with
+    # low = 2^(modulus_length - 1) / product, it is drawn with the bit length of
+    # 1.5 * low and drawn again until the modulus has the right length
+    primes = []
+    product = 1
+    while len(primes) < nr_primes - 1:
+        prime_length = modulus_length // nr_primes + (len(primes) < modulus_length % nr_primes)
+        p = generate_prime(prime_length, sieve=sieve, method=method)
+        if p not in primes:
+            primes.append(p)
+            product *= p
+    low = -(-(1 << (modulus_length - 1)) // product)
+    last_length = (3 * low // 2).bit_length()
+    while True:
+        p = generate_prime(last_length, sieve=sieve, method=method)
+        if p not in primes and (product * p).bit_length() == modulus_length:
+            return primes + [p]
+
+def generate_multiprime_key(primes):
+    n = 1
+    phi = 1
+    for p in primes:
+        n *= p
+        phi *= p - 1
+
+    e = random.randint(2, phi-1)
+    egcd_result = lehmer_egcd(e, phi)
+    while egcd_result[0] != 1:
+        e = random.randint(2, phi-1)
+        egcd_result = lehmer_egcd(e, phi)
+
+    d = egcd_result[1] % phi
+    return (e, d, n)
+
+def generate_multiprime_crt_key(d, primes):
+    # d_i = d mod (p_i - 1)
+    # c_i = (p_1 * ... * p_(i-1))^-1 mod p_i, coefficients used by Garner's algorithm
+    exponents = [d % (p - 1) for p in primes]
+    coefficients = [1]
+    prefix = primes[0]
+    for p in primes[1:]:
+        coefficients.append(pow(prefix, -1, p))
+        prefix *= p
+    return (exponents, coefficients)
+
+def garner(residues, primes, coefficients):
+    # Mixed-radix CRT recombination: x = x_1 + h_2 * p_1 + h_3 * p_1 * p_2 + ...
+    x = residues[0]
+    prefix = primes[0]
+    for i in range(1, len(primes)):
+        h = ((residues[i] - x) * coefficients[i]) % primes[i]
+        x += h * prefix
+        prefix *= primes[i]
+    return x
+
+def rsa_decrypt_multiprime_crt(c, primes, exponents, coefficients):
+    residues = [pow(c, d_i, p) for p, d_i in zip(primes, exponents)]
+    return garner(residues, primes, coefficients)
+
+def percentile(sorted_values, p):
+    # nearest-rank percentile of an already sorted list
+    index = max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+def test_multiprime_times(modulus_lengths=(2048, 3072), prime_counts=(2, 3, 4), nr_tests=50):
+    for modulus_length in modulus_lengths:
+        for nr_primes in prime_counts:
+            primes = generate_multiprime_primes(modulus_length, nr_primes)
+            e, d, n = generate_multiprime_key(primes)
+            exponents, coefficients = generate_multiprime_crt_key(d, primes)
+
+            times = []
+            for _ in range(nr_tests):
+                m = random.randrange(n)
+                c = rsa_encrypt(m, e, n)
+                start = time.time()
+                m2 = rsa_decrypt_multiprime_crt(c, primes, exponents, coefficients)
+                times.append(time.time() - start)
+                if m2 != m:
+                    raise ValueError("Multi-prime CRT decryption failed")
+            print(f"{modulus_length} bits, {nr_primes} primes, CRT average time: ", sum(times)/len(times))
+
+def test_rsa_times(workers=1, multiprime=False, keystore_path=None, index=0):
     prime_length = 1024
-    p, q = generate_prime(prime_length), generate_prime(prime_length)
-    e, d, n = generate_key(p, q)
+    if keystore_path is not None:
+        import keystore
+        key = keystore.load_key(keystore_path, index)
+        p, q, e, d, n = key.p, key.q, key.e, key.d, key.n
+        prime_length = p.bit_length()
+    elif workers > 1:
+        p, q, e, d, n = generate_keys_parallel(1, prime_length, workers)[0]
+    else:
+        p, q = generate_prime(prime_length), generate_prime(prime_length)
+        e, d, n = generate_key(p, q)
     dp, dq, qinv = generate_crt_key(d, p, q)
 
+    import rsa_keys
+    key = rsa_keys.RSAPrivateKey.from_parameters(n, e, d, p, q, dp, dq, qinv)
+
     rsa_times = []
     rsa_crt_times = []
+    rsa_key_times = []
 
-    for _ in range(100):
-        c = random.getrandbits(prime_length)
+    messages = [random.randrange(n) for _ in range(100)]
+    ciphertexts = [rsa_encrypt(m, e, n) for m in messages]
+    for message, c in zip(messages, ciphertexts):
         start = time.time()
         m = rsa_decrypt(c, d, n)
         rsa_times.append(time.time() - start)
@@ -143,9 +319,39 @@ def test_rsa_times():
         start = time.time()
         m2 = rsa_decrypt_crt(c, p, q, dp, dq, qinv)
         rsa_crt_times.append(time.time() - start)
-    
+
+        start = time.time()
+        m3 = key.decrypt(c)
+        rsa_key_times.append(time.time() - start)
+
+        if not m == m2 == m3 == message:
+            raise ValueError("RSA decryption failed")
+
+    start = time.time()
+    decrypted = key.decrypt_many(ciphertexts)
+    rsa_many_time = time.time() - start
+    if list(decrypted) != messages:
+        raise ValueError("RSAPrivateKey.decrypt_many failed")
+
     print("RSA average time: ", sum(rsa_times)/len(rsa_times))
     print("RSA CRT average time: ", sum(rsa_crt_times)/len(rsa_crt_times))
+    print("RSAPrivateKey.decrypt average time: ", sum(rsa_key_times)/len(rsa_key_times))
+    print("RSAPrivateKey.decrypt_many average time: ", rsa_many_time/len(ciphertexts))
+
+    if multiprime:
+        test_multiprime_times()
+
+def test_prime_times(prime_length=1024, nr_primes=10):
+    modes = [("No sieve", False, "miller_rabin"), ("Sieve", True, "miller_rabin"), ("Sieve + Baillie-PSW", True, "deterministic")]
+    for name, sieve, method in modes:
+        stats = {}
+        start = time.perf_counter()
+        for _ in range(nr_primes):
+            generate_prime(prime_length, sieve=sieve, stats=stats, method=method)
+        elapsed = time.perf_counter() - start
+        print(name)
+        print("  Average time per prime: ", elapsed / nr_primes)
+        print("  Candidates sieved: ", stats["sieved"], "primality tested: ", stats["tested"])
 
 
 def main():
@@ -157,6 +363,7 @@ Commands:
                       Parameters:
                         -a: First integer
                         -b: Second integer
+                        --lehmer: Lehmer's algorithm, faster for operands of thousands of bits
                       Output: gcd, x, y
                       Example: python3 rsa.py egcd -a 240 -b 46
 
@@ -165,21 +372,37 @@ Commands:
                         -a: Base
                         -b: Exponent
                         -m: Modulus
+                        --method: binary, window, fixed_base or pow (default: binary)
+                        -w: Window size for window and fixed_base (default: chosen from the exponent size)
                       Output: Result
-                      Example: python3 rsa.py modexp -a 2 -b 10 -m 1000
+                      Example: python3 rsa.py modexp -a 2 -b 10 -m 1000 --method window
 
   miller_rabin        Miller-Rabin Primality Test
                       Parameters:
                         -n: Number to test
                         -k: Number of rounds (default: 5)
+                        --deterministic: Fixed witnesses below 2^64, Baillie-PSW above
                       Output: primality result (probably true or false)
                       Example: python3 rsa.py miller_rabin -n 17
 
   generate_prime      Generate Prime Number
                       Parameters:
                         -k: Number of bits
-                      Output: Generated prime
-                      Example: python3 rsa.py generate_prime -k 1024
+                        --sieve: Incremental search with small-prime sieve
+                        --deterministic: Deterministic Miller-Rabin / Baillie-PSW test
+                        --safe: Safe prime p = 2q + 1, q and p sieved together
+                        --strong: Strong prime (Gordon's algorithm)
+                      Output: Generated prime (and candidate statistics)
+                      Example: python3 rsa.py generate_prime -k 1024 --sieve
+                               python3 rsa.py generate_prime -k 512 --safe
+
+  generate_rsa_keys   Generate RSA Keys with a pool of worker processes
+                      Parameters:
+                        -k: Number of bits of each prime
+                        -n: Number of keys (default: 1)
+                        --workers: Number of worker processes (default: number of cores)
+                      Output: p, q, e, d, n for every key, elapsed time
+                      Example: python3 rsa.py generate_rsa_keys -k 1024 -n 4 --workers 4
 
   rsa_encrypt         RSA Encryption
                       Parameters:
@@ -197,6 +420,40 @@ Commands:
                       Output: Message
                       Example: python3 rsa.py rsa_decrypt -c 12345 -d 2753 -n 3233
 
+  rsa_decrypt_batch   RSA Decryption of a file of ciphertexts with a pool of worker processes
+                      Parameters:
+                        -i: Input file, one ciphertext per line
+                        -o: Output file, one message per line
+                        -p: Prime p
+                        -q: Prime q
+                        -e: Public exponent
+                        --keystore: Keystore file, instead of -p, -q and -e
+                        --index: Index of the key in the keystore (default: 0)
+                        --workers: Number of worker processes (default: number of cores)
+                        --chunk-size: Ciphertexts per chunk (default: 256)
+                      Output: Number of decrypted ciphertexts, throughput in ops/sec
+                      Example: python3 rsa.py rsa_decrypt_batch -i ciphertexts.txt -o messages.txt -p 61 -q 53 -e 17
+
+  rsa_encrypt_file    RSA Encryption of a file, PKCS#1 v1.5 padded blocks
+                      Parameters:
+                        -i: Input file
+                        -o: Output file
+                        --keystore: Keystore file with the key
+                        --index: Index of the key in the keystore (default: 0)
+                        --workers: Number of worker processes (default: number of cores)
+                      Output: Encrypted file, throughput in MB/s of plaintext
+                      Example: python3 rsa.py rsa_encrypt_file -i message.txt -o message.enc --keystore keys.bin
+
+  rsa_decrypt_file    RSA Decryption of a file encrypted with rsa_encrypt_file, CRT in worker processes
+                      Parameters:
+                        -i: Input file
+                        -o: Output file
+                        --keystore: Keystore file with the key
+                        --index: Index of the key in the keystore (default: 0)
+                        --workers: Number of worker processes (default: number of cores)
+                      Output: Decrypted file, throughput in MB/s of plaintext
+                      Example: python3 rsa.py rsa_decrypt_file -i message.enc -o message.txt --keystore keys.bin
+
   rsa_decrypt_crt     RSA Decryption with CRT
                       Parameters:
                         -c: Ciphertext
@@ -223,9 +480,66 @@ Commands:
                       Output: dp, dq, qinv
                       Example: python3 rsa.py generate_rsa_crt_keys -d 2753 -p 61 -q 53
 
+  batch               Batch mode: JSON operations on stdin, one per line, JSON results on stdout
+                      Parameters:
+                        --workers: Worker processes for the heavy operations (default: 0, everything in this process)
+                      Input: {"id": 1, "op": "modexp", "a": 2, "b": 10, "m": 1000}, the operations are
+                             the commands of this script, plus rsa_decrypt_key with "keystore"/"index" or "p"/"q"/"e"
+                      Output: {"id": 1, "result": {"result": 24}} or {"id": 1, "error": "..."}, in input order
+                      Example: python3 rsa.py batch --workers 4 < operations.jsonl > results.jsonl
+
   test_rsa_times      Test RSA Times
-                      Output: RSA average time, RSA CRT average time
-                      Example: python3 rsa.py test_rsa_times
+                      Parameters:
+                        --workers: Processes used to generate p and q (default: 1)
+                        --multiprime: Also compare 2, 3 and 4 prime CRT decryption at 2048 and 3072 bits
+                        --keystore: Take the key from a keystore instead of generating it
+                        --index: Index of the key in the keystore (default: 0)
+                      Output: RSA average time, RSA CRT average time, RSAPrivateKey average times
+                      Example: python3 rsa.py test_rsa_times --multiprime
+
+  generate_multiprime_key Generate Multi-Prime RSA Key
+                      Parameters:
+                        -k: Number of bits of the modulus
+                        -r: Number of primes (default: 3)
+                      Output: primes, e, d, n, CRT exponents and Garner coefficients
+                      Example: python3 rsa.py generate_multiprime_key -k 2048 -r 3
+
+  keystore_generate   Generate a keystore of RSA keys with a pool of worker processes
+                      Parameters:
+                        -f: Keystore file
+                        -n: Number of keys
+                        -k: Number of bits of each prime
+                        --workers: Number of worker processes (default: number of cores)
+                      Output: Keystore file with n, e, d, p, q, dp, dq, qinv of every key
+                      Example: python3 rsa.py keystore_generate -f keys.bin -n 100 -k 1024
+
+  keystore_list       List the keys of a keystore
+                      Parameters:
+                        -f: Keystore file
+                      Output: index, modulus size, public exponent size and leading digits of n of every key
+                      Example: python3 rsa.py keystore_list -f keys.bin
+
+  test_blinding_times Test Blinded RSA CRT Decryption Times
+                      Parameters:
+                        -k: Number of bits of each prime (default: 1024)
+                        -n: Number of decryptions (default: 200)
+                        -e: Public exponent (default: random, as generate_rsa_key)
+                      Output: ops/sec without blinding, with a fresh blinding pair per call and with pooled pairs
+                      Example: python3 rsa.py test_blinding_times -k 1024 -e 65537
+
+  test_modexp_times   Test Modular Exponentiation Times
+                      Parameters:
+                        -k: Number of bits of modulus and exponents (default: 1024)
+                        -n: Number of exponents (default: 20)
+                      Output: Average time of binary, sliding window, fixed-base and built-in pow
+                      Example: python3 rsa.py test_modexp_times -k 2048
+
+  test_prime_times    Test Prime Generation Times
+                      Parameters:
+                        -k: Number of bits (default: 1024)
+                        -n: Number of primes (default: 10)
+                      Output: Average time and candidate statistics for each search mode
+                      Example: python3 rsa.py test_prime_times -k 1024 -n 10
 """,
         formatter_class=argparse.RawTextHelpFormatter,
     )
@@ -235,21 +549,35 @@ Commands:
     parser_egcd = subparsers.add_parser("egcd", help="Extended Euclidean Algorithm")
     parser_egcd.add_argument("-a", type=int, required=True, help="First integer")
     parser_egcd.add_argument("-b", type=int, required=True, help="Second integer")
+    parser_egcd.add_argument("--lehmer", action="store_true", help="Lehmer's extended GCD")
 
     # Modular Exponentiation
     parser_modexp = subparsers.add_parser("modexp", help="Modular Exponentiation")
     parser_modexp.add_argument("-a", type=int, required=True, help="Base")
     parser_modexp.add_argument("-b", type=int, required=True, help="Exponent")
     parser_modexp.add_argument("-m", type=int, required=True, help="Modulus")
+    parser_modexp.add_argument("--method", choices=["binary", "window", "fixed_base", "pow"], default="binary", help="Exponentiation method")
+    parser_modexp.add_argument("-w", type=int, default=None, help="Window size")
 
     # Miller-Rabin Primality Test
     parser_miller_rabin = subparsers.add_parser("miller_rabin", help="Miller-Rabin Primality Test")
     parser_miller_rabin.add_argument("-n", type=int, required=True, help="Number to test")
     parser_miller_rabin.add_argument("-k", type=int, default=5, help="Number of rounds")
+    parser_miller_rabin.add_argument("--deterministic", action="store_true", help="Fixed witnesses below 2^64, Baillie-PSW above")
 
     # Prime Number Generator
     parser_generate_prime = subparsers.add_parser("generate_prime", help="Generate Prime Number")
     parser_generate_prime.add_argument("-k", type=int, required=True, help="Number of bits")
+    parser_generate_prime.add_argument("--sieve", action="store_true", help="Incremental search with small-prime sieve")
+    parser_generate_prime.add_argument("--deterministic", action="store_true", help="Deterministic Miller-Rabin / Baillie-PSW test")
+    parser_generate_prime.add_argument("--safe", action="store_true", help="Safe prime p = 2q + 1")
+    parser_generate_prime.add_argument("--strong", action="store_true", help="Strong prime (Gordon's algorithm)")
+
+    # Parallel RSA Key Generation
+    parser_generate_rsa_keys = subparsers.add_parser("generate_rsa_keys", help="Generate RSA Keys with a pool of worker processes")
+    parser_generate_rsa_keys.add_argument("-k", type=int, required=True, help="Number of bits of each prime")
+    parser_generate_rsa_keys.add_argument("-n", type=int, default=1, help="Number of keys")
+    parser_generate_rsa_keys.add_argument("--workers", type=int, default=None, help="Number of worker processes")
 
     # RSA Encryption
     parser_rsa_encrypt = subparsers.add_parser("rsa_encrypt", help="RSA Encryption")
@@ -263,6 +591,27 @@ Commands:
     parser_rsa_decrypt.add_argument("-d", type=int, required=True, help="Private exponent")
     parser_rsa_decrypt.add_argument("-n", type=int, required=True, help="Modulus")
 
+    # Batch RSA Decryption
+    parser_rsa_decrypt_batch = subparsers.add_parser("rsa_decrypt_batch", help="RSA Decryption of a file of ciphertexts")
+    parser_rsa_decrypt_batch.add_argument("-i", type=str, required=True, help="Input file, one ciphertext per line")
+    parser_rsa_decrypt_batch.add_argument("-o", type=str, required=True, help="Output file, one message per line")
+    parser_rsa_decrypt_batch.add_argument("-p", type=int, help="Prime p")
+    parser_rsa_decrypt_batch.add_argument("-q", type=int, help="Prime q")
+    parser_rsa_decrypt_batch.add_argument("-e", type=int, help="Public exponent")
+    parser_rsa_decrypt_batch.add_argument("--keystore", type=str, default=None, help="Keystore file, instead of -p, -q and -e")
+    parser_rsa_decrypt_batch.add_argument("--index", type=int, default=0, help="Index of the key in the keystore")
+    parser_rsa_decrypt_batch.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser_rsa_decrypt_batch.add_argument("--chunk-size", type=int, default=256, help="Ciphertexts per chunk")
+
+    # RSA File Encryption and Decryption
+    for name, help_text in [("rsa_encrypt_file", "RSA Encryption of a file"), ("rsa_decrypt_file", "RSA Decryption of a file")]:
+        parser_file = subparsers.add_parser(name, help=help_text)
+        parser_file.add_argument("-i", type=str, required=True, help="Input file")
+        parser_file.add_argument("-o", type=str, required=True, help="Output file")
+        parser_file.add_argument("--keystore", type=str, required=True, help="Keystore file with the key")
+        parser_file.add_argument("--index", type=int, default=0, help="Index of the key in the keystore")
+        parser_file.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+
     # RSA Decryption with CRT
     parser_rsa_decrypt_crt = subparsers.add_parser("rsa_decrypt_crt", help="RSA Decryption with CRT")
     parser_rsa_decrypt_crt.add_argument("-c", type=int, required=True, help="Ciphertext")
@@ -283,28 +632,99 @@ Commands:
     parser_generate_rsa_crt_keys.add_argument("-p", type=int, required=True, help="Prime p")
     parser_generate_rsa_crt_keys.add_argument("-q", type=int, required=True, help="Prime q")
 
+    # Batch mode
+    parser_batch = subparsers.add_parser("batch", help="JSON operations on stdin, JSON results on stdout")
+    parser_batch.add_argument("--workers", type=int, default=0, help="Worker processes for the heavy operations")
+
     # Test RSA Times
     parser_test_rsa_times = subparsers.add_parser("test_rsa_times", help="Test RSA Times")
+    parser_test_rsa_times.add_argument("--workers", type=int, default=1, help="Processes used to generate p and q")
+    parser_test_rsa_times.add_argument("--multiprime", action="store_true", help="Compare 2, 3 and 4 prime CRT decryption")
+    parser_test_rsa_times.add_argument("--keystore", type=str, default=None, help="Take the key from a keystore")
+    parser_test_rsa_times.add_argument("--index", type=int, default=0, help="Index of the key in the keystore")
+
+    # Generate Multi-Prime RSA Key
+    parser_generate_multiprime_key = subparsers.add_parser("generate_multiprime_key", help="Generate Multi-Prime RSA Key")
+    parser_generate_multiprime_key.add_argument("-k", type=int, required=True, help="Number of bits of the modulus")
+    parser_generate_multiprime_key.add_argument("-r", type=int, default=3, help="Number of primes")
+
+    # Keystore
+    parser_keystore_generate = subparsers.add_parser("keystore_generate", help="Generate a keystore of RSA keys")
+    parser_keystore_generate.add_argument("-f", type=str, required=True, help="Keystore file")
+    parser_keystore_generate.add_argument("-n", type=int, required=True, help="Number of keys")
+    parser_keystore_generate.add_argument("-k", type=int, required=True, help="Number of bits of each prime")
+    parser_keystore_generate.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+
+    parser_keystore_list = subparsers.add_parser("keystore_list", help="List the keys of a keystore")
+    parser_keystore_list.add_argument("-f", type=str, required=True, help="Keystore file")
+
+    # Test Blinded RSA Decryption Times
+    parser_test_blinding_times = subparsers.add_parser("test_blinding_times", help="Test Blinded RSA CRT Decryption Times")
+    parser_test_blinding_times.add_argument("-k", type=int, default=1024, help="Number of bits of each prime")
+    parser_test_blinding_times.add_argument("-n", type=int, default=200, help="Number of decryptions")
+    parser_test_blinding_times.add_argument("-e", type=int, default=None, help="Public exponent")
+
+    # Test Modular Exponentiation Times
+    parser_test_modexp_times = subparsers.add_parser("test_modexp_times", help="Test Modular Exponentiation Times")
+    parser_test_modexp_times.add_argument("-k", type=int, default=1024, help="Number of bits of modulus and exponents")
+    parser_test_modexp_times.add_argument("-n", type=int, default=20, help="Number of exponents")
+
+    # Test Prime Generation Times
+    parser_test_prime_times = subparsers.add_parser("test_prime_times", help="Test Prime Generation Times")
+    parser_test_prime_times.add_argument("-k", type=int, default=1024, help="Number of bits")
+    parser_test_prime_times.add_argument("-n", type=int, default=10, help="Number of primes")
 
     args = parser.parse_args()
 
     if args.command is None:
         parser.print_help()
     elif args.command == "egcd":
-        gcd, x, y = egcd(args.a, args.b)
+        gcd, x, y = lehmer_egcd(args.a, args.b) if args.lehmer else egcd(args.a, args.b)
         print(f"gcd: {gcd}, x: {x}, y: {y}")
 
     elif args.command == "modexp":
-        result = binary_modular_exponentiation(args.a, args.b, args.m)
+        if args.method == "window":
+            result = modexp.sliding_window_exponentiation(args.a, args.b, args.m, args.w)
+        elif args.method == "fixed_base":
+            fixed_base = modexp.FixedBaseExponentiation(args.a, args.m, max(args.b.bit_length(), 1), args.w or 4)
+            result = fixed_base.pow(args.b)
+        elif args.method == "pow":
+            result = pow(args.a, args.b, args.m)
+        else:
+            result = binary_modular_exponentiation(args.a, args.b, args.m)
         print(f"Result: {result}")
 
     elif args.command == "miller_rabin":
-        result = miller_rabin(args.n, args.k)
-        print(f"Is probably prime: {result}")
+        if args.deterministic:
+            result = primality.is_prime(args.n)
+            print(f"Is prime: {result}")
+        else:
+            result = miller_rabin(args.n, args.k)
+            print(f"Is probably prime: {result}")
 
     elif args.command == "generate_prime":
-        prime = generate_prime(args.k)
+        stats = {}
+        method = "deterministic" if args.deterministic else "miller_rabin"
+        if args.strong and args.k < 32:
+            parser.error("generate_prime --strong needs k >= 32")
+        if args.safe:
+            prime = generate_safe_prime(args.k, stats=stats, method=method)
+        elif args.strong:
+            prime = generate_strong_prime(args.k, stats=stats, method=method)
+        else:
+            prime = generate_prime(args.k, sieve=args.sieve, stats=stats, method=method)
         print(f"Generated prime: {prime}")
+        print(f"Candidates sieved: {stats['sieved']}, primality tested: {stats['tested']}")
+
+    elif args.command == "generate_rsa_keys":
+        stats = {}
+        start = time.perf_counter()
+        keys = generate_keys_parallel(args.n, args.k, args.workers, stats=stats)
+        elapsed = time.perf_counter() - start
+        for p, q, e, d, n in keys:
+            print(f"p: {p}, q: {q}, e: {e}, d: {d}, n: {n}")
+        print(f"Generated {len(keys)} keys in {elapsed:.3f} s")
+        print(f"Candidates sieved: {stats.get('sieved', 0)}, primality tested: {stats.get('tested', 0)}")
 
     elif args.command == "rsa_encrypt":
         ciphertext = rsa_encrypt(args.m, args.e, args.n)
@@ -314,6 +734,41 @@ Commands:
         message = rsa_decrypt(args.c, args.d, args.n)
         print(f"Message: {message}")
 
+    elif args.command == "rsa_decrypt_batch":
+        import rsa_keys
+        import rsa_batch
+        if args.keystore is not None:
+            import keystore
+            key = keystore.load_key(args.keystore, args.index)
+        elif args.p is None or args.q is None or args.e is None:
+            parser.error("rsa_decrypt_batch needs either --keystore or -p, -q and -e")
+        else:
+            key = rsa_keys.RSAPrivateKey(args.p, args.q, args.e)
+        count = 0
+        start = time.perf_counter()
+        with open(args.i, 'r') as input_file, open(args.o, 'w') as output_file:
+            ciphertexts = rsa_batch.read_ciphertexts(input_file)
+            for message in rsa_batch.decrypt_batch(key, ciphertexts, args.workers, args.chunk_size):
+                output_file.write(f"{message}\n")
+                count += 1
+        elapsed = time.perf_counter() - start
+        print(f"Decrypted {count} ciphertexts in {elapsed:.3f} s ({count / elapsed:.1f} ops/sec)")
+
+    elif args.command in ("rsa_encrypt_file", "rsa_decrypt_file"):
+        import keystore
+        import rsa_stream
+        with keystore.KeyStore(args.keystore) as store:
+            if args.command == "rsa_encrypt_file":
+                key = store.public_key(args.index)
+                process = rsa_stream.encrypt_file
+            else:
+                key = store[args.index]
+                process = rsa_stream.decrypt_file
+        start = time.perf_counter()
+        size = process(key, args.i, args.o, args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"Processed {size} bytes in {elapsed:.3f} s ({size / elapsed / 1e6:.3f} MB/s)")
+
     elif args.command == "rsa_decrypt_crt":
         message = rsa_decrypt_crt(args.c, args.p, args.q, args.dp, args.dq, args.qinv)
         print(f"Message: {message}")
@@ -326,8 +781,47 @@ Commands:
         dp, dq, qinv = generate_crt_key(args.d, args.p, args.q)
         print(f"dp: {dp}, dq: {dq}, qinv: {qinv}")
 
+    elif args.command == "batch":
+        import rsa_serve
+        rsa_serve.serve(sys.stdin, sys.stdout, args.workers)
+
     elif args.command == "test_rsa_times":
-        test_rsa_times()
+        test_rsa_times(args.workers, args.multiprime, args.keystore, args.index)
+
+    elif args.command == "generate_multiprime_key":
+        primes = generate_multiprime_primes(args.k, args.r)
+        e, d, n = generate_multiprime_key(primes)
+        exponents, coefficients = generate_multiprime_crt_key(d, primes)
+        print(f"primes: {primes}")
+        print(f"e: {e}, d: {d}, n: {n}")
+        print(f"exponents: {exponents}, coefficients: {coefficients}")
+
+    elif args.command == "keystore_generate":
+        import rsa_keys
+        import keystore
+        start = time.perf_counter()
+        keys = generate_keys_parallel(args.n, args.k, args.workers, method="deterministic")
+        keystore.write_keystore(args.f, [rsa_keys.RSAPrivateKey(p, q, e, d) for p, q, e, d, n in keys])
+        elapsed = time.perf_counter() - start
+        print(f"Generated {len(keys)} keys with {args.k}-bit primes in {elapsed:.3f} s, saved to {args.f}")
+
+    elif args.command == "keystore_list":
+        import keystore
+        with keystore.KeyStore(args.f) as store:
+            for i in range(len(store)):
+                public_key = store.public_key(i)
+                print(f"{i}: n: {public_key.n.bit_length()} bits ({str(public_key.n)[:20]}...), e: {public_key.e.bit_length()} bits")
+            print(f"{len(store)} keys")
+
+    elif args.command == "test_blinding_times":
+        import rsa_blinding
+        rsa_blinding.benchmark(args.k, args.n, args.e)
+
+    elif args.command == "test_modexp_times":
+        modexp.benchmark(args.k, args.n)
+
+    elif args.command == "test_prime_times":
+        test_prime_times(args.k, args.n)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,7 +1,13 @@
+import argparse
+import os
 import rsa
 import random
 import math
 import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Factoring n from the private exponent d: e * d - 1 is a multiple of phi(n),
+# write it as 2^r * m and look for a non-trivial square root of 1 modulo n
 
 def decryptionexp(n: int, d: int, e: int):
     m = e * d - 1
@@ -14,7 +20,7 @@ def decryptionexp(n: int, d: int, e: int):
         iterations += 1
         x = random.randint(1, n - 1)
         if math.gcd(x, n) != 1:
-            return x
+            return math.gcd(x, n), iterations
 
         x_0 = pow(x, m, n)
         if x_0 == 1:
@@ -29,59 +35,94 @@ def decryptionexp(n: int, d: int, e: int):
                 break
             x_0 = x_next
 
-        
-def test_rsa_decryption(nr_tests, nr_bits):
-    iterations = nr_tests
-    k = nr_bits
-
-    exec_time_list = []
-    algorithm_iterations_list = []
-
-    for i in range(iterations):
-        print("Iteration", i)
-
-        p = rsa.generate_prime(k)
-        q = rsa.generate_prime(k)
-        e, d, n = rsa.generate_key(p, q)
-
-        start_time = time.perf_counter()
-        _, j = decryptionexp(n, d, e)
-        end_time = time.perf_counter()
-
-        exec_time = end_time - start_time
-        exec_time_list.append(exec_time)
-        algorithm_iterations_list.append(j)
-    
-    # calculate average execution time
-    avg_exec_time = sum(exec_time_list) / iterations
-
-    # calculate variance of execution time
-    var_exec_time = 0
-    for exec_time in exec_time_list:
-        var_exec_time += (exec_time - avg_exec_time) ** 2
-    var_exec_time /= iterations
 
-    # calculate average algorithm iterations
-    avg_algorithm_iterations = sum(algorithm_iterations_list) / len(algorithm_iterations_list)
-
-    return avg_algorithm_iterations, var_exec_time, avg_exec_time
-
-def display_results(avg_algorithm_iterations, var_exec_time, avg_exec_time, nr_tests, k):
-    print(f"{'Metric':<30}{'Value':<20}")
-    print("-" * 50)
+def generate_fixtures(nr_keys, nr_bits, workers=None):
+    # (n, d, e) for nr_keys keys with nr_bits-bit primes, the primes are generated
+    # by a pool of processes before any measurement starts
+    keys = rsa.generate_keys_parallel(nr_keys, nr_bits, workers, method="deterministic")
+    return [(n, d, e) for _, _, e, d, n in keys]
+
+def load_fixtures(keystore_path, nr_keys, nr_bits):
+    # (n, d, e) of the first nr_keys keys of the keystore with nr_bits-bit primes
+    import keystore
+    fixtures = []
+    with keystore.KeyStore(keystore_path) as store:
+        for key in store:
+            if key.p.bit_length() == nr_bits:
+                fixtures.append((key.n, key.d, key.e))
+                if len(fixtures) == nr_keys:
+                    break
+    return fixtures
+
+def _init_trial_worker():
+    # independent random stream for the witnesses of every worker
+    random.seed(os.urandom(32))
+
+def run_trial(fixture):
+    n, d, e = fixture
+    start_time = time.perf_counter()
+    factor, iterations = decryptionexp(n, d, e)
+    exec_time = time.perf_counter() - start_time
+    if n % factor != 0:
+        raise ValueError("decryptionexp returned a wrong factor")
+    return iterations, exec_time
+
+def summarize(values):
+    values = sorted(values)
+    mean = sum(values) / len(values)
+    variance = sum((value - mean) ** 2 for value in values) / len(values)
+    return {
+        "mean": mean,
+        "variance": variance,
+        "min": values[0],
+        "p50": rsa.percentile(values, 50),
+        "p90": rsa.percentile(values, 90),
+        "p99": rsa.percentile(values, 99),
+        "max": values[-1],
+    }
+
+def test_rsa_decryption(nr_tests, nr_bits, workers=None, fixtures=None):
+    # only decryptionexp is timed, key generation happens before (or not at all
+    # if the fixtures are given)
+    if fixtures is None:
+        fixtures = generate_fixtures(nr_tests, nr_bits, workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_trial_worker) as executor:
+        results = list(executor.map(run_trial, fixtures))
+
+    algorithm_iterations_list = [iterations for iterations, _ in results]
+    exec_time_list = [exec_time for _, exec_time in results]
+    return summarize(algorithm_iterations_list), summarize(exec_time_list)
+
+def display_results(iterations_stats, time_stats, nr_tests, k):
     print(f"{'Number of Tests':<30}{nr_tests:<20}")
     print(f"{'Number of Bits':<30}{k:<20}")
-    print(f"{'Average Algorithm Iterations':<30}{avg_algorithm_iterations:<20}")
-    print(f"{'Average Execution Time':<30}{avg_exec_time:<20}")
-    print(f"{'Time Variance':<30}{var_exec_time:<20}")
-
-
-
-nr_tests = 100
-k = 1024
-
-avg_algorithm_iterations, var_exec_time, avg_exec_time = test_rsa_decryption(nr_tests, k)
-display_results(avg_algorithm_iterations, var_exec_time, avg_exec_time, nr_tests, k)
-
-    
-    
\ No newline at end of file
+    print(f"{'Metric':<30}{'Iterations':<20}{'Execution Time (s)':<20}")
+    print("-" * 70)
+    for metric in ["mean", "variance", "min", "p50", "p90", "p99", "max"]:
+        print(f"{metric:<30}{iterations_stats[metric]:<20.6g}{time_stats[metric]:<20.6g}")
+    print()
+
+def main():
+    parser = argparse.ArgumentParser(description="Factoring n from the private exponent d: iterations and execution time statistics")
+    parser.add_argument("-n", type=int, default=100, help="Number of tests (keys) per bit size (default: 100)")
+    parser.add_argument("-k", type=int, nargs="+", default=[1024], help="Number of bits of each prime, one or more sizes (default: 1024)")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: number of cores)")
+    parser.add_argument("--keystore", type=str, default=None, help="Take the keys from a keystore (see rsa.py keystore_generate) instead of generating them")
+    args = parser.parse_args()
+
+    for k in args.k:
+        start = time.perf_counter()
+        if args.keystore is not None:
+            fixtures = load_fixtures(args.keystore, args.n, k)
+            if not fixtures:
+                print(f"No keys with {k}-bit primes in {args.keystore}")
+                continue
+            print(f"Loaded {len(fixtures)} keys with {k}-bit primes in {time.perf_counter() - start:.3f} s")
+        else:
+            fixtures = generate_fixtures(args.n, k, args.workers)
+            print(f"Generated {len(fixtures)} keys with {k}-bit primes in {time.perf_counter() - start:.3f} s")
+        iterations_stats, time_stats = test_rsa_decryption(len(fixtures), k, args.workers, fixtures)
+        display_results(iterations_stats, time_stats, len(fixtures), k)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Batch decryption: the ciphertexts are split into chunks that are decrypted by
+# a pool of worker processes. The key is sent to every worker once, when the
+# worker starts, so a chunk only carries the ciphertexts.
+
+_worker_key = None
+
+def init_worker(key):
+    global _worker_key
+    _worker_key = key
+
+def decrypt_chunk(chunk):
+    return _worker_key.decrypt_many(chunk)
+
+def encrypt_chunk(chunk):
+    return _worker_key.encrypt_many(chunk)
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def map_batch(function, key, items, workers=None, chunk_size=256, max_pending=None):
+    # Generator: yields function's results in the same order as the items.
+    # The input is consumed lazily, at most max_pending chunks are in flight
+    # at any time so memory does not grow with the size of the input.
+    workers = workers or os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(key,)) as executor:
+        pending = deque()
+        for chunk in chunked(items, chunk_size):
+            pending.append(executor.submit(function, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def decrypt_batch(key, ciphertexts, workers=None, chunk_size=256, max_pending=None):
+    return map_batch(decrypt_chunk, key, ciphertexts, workers, chunk_size, max_pending)
+
+def encrypt_batch(key, messages, workers=None, chunk_size=256, max_pending=None):
+    return map_batch(encrypt_chunk, key, messages, workers, chunk_size, max_pending)
+
+def read_ciphertexts(file):
+    # one integer per line, blank lines are skipped
+    for line in file:
+        line = line.strip()
+        if line:
+            yield int(line)
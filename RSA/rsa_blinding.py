@@ -0,0 +1,149 @@
+import random
+import secrets
+import threading
+import time
+from collections import deque
+
+import rsa
+import rsa_keys
+# rsa puts ModularArithmetic/ExtendedEuclid on the path
+from egcd import batch_inverse
+
+# RSA blinding: c' = c * r^e, m' = c'^d = m * r, m = m' * r^-1.
+# A fresh pair (r^e, r^-1) costs a full exponentiation and an inversion, so the
+# pairs are kept in a pool: after every use a pair is refreshed by squaring both
+# values ((r^2)^e = (r^e)^2, (r^2)^-1 = (r^-1)^2) and goes back to the pool.
+# A pair is squared at most max_uses times, then it is dropped and a background
+# thread replaces it with a fresh one (one batch inversion for all the new pairs).
+
+def fresh_blinding_pairs(key, count):
+    n, e = key.n, key.e
+    rs = []
+    while len(rs) < count:
+        # the blinding factor must be unpredictable: secrets, not the random module
+        r = 2 + secrets.randbelow(n - 3)
+        if r % key.p and r % key.q:
+            rs.append(r)
+    return [(pow(r, e, n), r_inv, 0) for r, r_inv in zip(rs, batch_inverse(rs, n))]
+
+class BlindingPool:
+    def __init__(self, key, size=32, max_uses=32, background=True):
+        self.key = key
+        self.size = size
+        self.max_uses = max_uses
+        self.pairs = deque(fresh_blinding_pairs(key, size))
+        self.refill_needed = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self._refill_loop, daemon=True)
+            self.thread.start()
+
+    def _refill_loop(self):
+        while not self.stopped.is_set():
+            self.refill_needed.wait()
+            self.refill_needed.clear()
+            if self.stopped.is_set():
+                break
+            self.refill()
+
+    def refill(self):
+        missing = self.size - len(self.pairs)
+        if missing > 0:
+            pairs = fresh_blinding_pairs(self.key, missing)
+            # pairs given back while the new ones were computed count too
+            self.pairs.extend(pairs[:max(self.size - len(self.pairs), 0)])
+
+    def take(self):
+        try:
+            return self.pairs.popleft()
+        except IndexError:
+            # the background thread is late: pay for one fresh pair
+            return fresh_blinding_pairs(self.key, 1)[0]
+
+    def give_back(self, pair):
+        if len(self.pairs) >= self.size:
+            # the pool is full (the pair was made by take when it was empty): drop it
+            return
+        blind, unblind, uses = pair
+        if uses + 1 < self.max_uses:
+            n = self.key.n
+            self.pairs.append((blind * blind % n, unblind * unblind % n, uses + 1))
+        elif self.thread is not None:
+            self.refill_needed.set()
+        else:
+            self.refill()
+
+    def close(self):
+        self.stopped.set()
+        self.refill_needed.set()
+        if self.thread is not None:
+            self.thread.join()
+
+class BlindedRSAPrivateKey:
+    __slots__ = ("key", "pool")
+
+    def __init__(self, key, pool_size=32, max_uses=32, background=True):
+        self.key = key
+        self.pool = BlindingPool(key, pool_size, max_uses, background)
+
+    def decrypt(self, c):
+        pair = self.pool.take()
+        blind, unblind, _ = pair
+        n = self.key.n
+        m = self.key.decrypt(c * blind % n) * unblind % n
+        self.pool.give_back(pair)
+        return m
+
+    def decrypt_many(self, ciphertexts):
+        return [self.decrypt(c) for c in ciphertexts]
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def decrypt_fresh_blinding(key, c):
+    # baseline: a new blinding pair for every ciphertext
+    n = key.n
+    r = 2 + secrets.randbelow(n - 3)
+    m = key.decrypt(c * pow(r, key.e, n) % n)
+    return m * pow(r, -1, n) % n
+
+def benchmark(prime_length=1024, nr_tests=200, e=None):
+    # e = None: random public exponent as in rsa.generate_key, so a fresh
+    # blinding pair costs a full-size exponentiation
+    while True:
+        p = rsa.generate_prime(prime_length, sieve=True, method="deterministic")
+        q = rsa.generate_prime(prime_length, sieve=True, method="deterministic")
+        if p == q:
+            continue
+        if e is None:
+            key = rsa_keys.RSAPrivateKey(p, q, rsa.generate_key(p, q)[0])
+            break
+        if (p - 1) % e and (q - 1) % e:
+            key = rsa_keys.RSAPrivateKey(p, q, e)
+            break
+    messages = [random.randrange(key.n) for _ in range(nr_tests)]
+    ciphertexts = [key.encrypt(m) for m in messages]
+
+    with BlindedRSAPrivateKey(key) as blinded_key:
+        methods = [
+            ("CRT, no blinding", key.decrypt),
+            ("CRT, fresh blinding pair", lambda c: decrypt_fresh_blinding(key, c)),
+            ("CRT, pooled blinding pairs", blinded_key.decrypt),
+        ]
+        print(f"{2 * prime_length}-bit modulus, {key.e.bit_length()}-bit e, {nr_tests} decryptions")
+        print(f"{'Method':<32}{'ops/sec':<20}")
+        print("-" * 52)
+        for name, method in methods:
+            start = time.perf_counter()
+            results = [method(c) for c in ciphertexts]
+            elapsed = time.perf_counter() - start
+            if results != messages:
+                raise ValueError(f"{name} returned a wrong message")
+            print(f"{name:<32}{nr_tests / elapsed:<20.1f}")
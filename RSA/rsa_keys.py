@@ -0,0 +1,85 @@
+import rsa
+
+# Key objects: the CRT parameters are computed once when the key is built,
+# so the decryption hot path only needs the ciphertext.
+
+class RSAPublicKey:
+    __slots__ = ("n", "e")
+
+    def __init__(self, n, e):
+        self.n = n
+        self.e = e
+
+    def encrypt(self, m):
+        return pow(m, self.e, self.n)
+
+    def encrypt_many(self, messages):
+        n, e = self.n, self.e
+        return [pow(m, e, n) for m in messages]
+
+    def __repr__(self):
+        return f"RSAPublicKey(n={self.n}, e={self.e})"
+
+
+class RSAPrivateKey:
+    __slots__ = ("n", "e", "d", "p", "q", "dp", "dq", "qinv")
+
+    def __init__(self, p, q, e, d=None):
+        self.p = p
+        self.q = q
+        self.n = p * q
+        self.e = e
+        self.d = d if d is not None else pow(e, -1, (p - 1) * (q - 1))
+        self.dp, self.dq, self.qinv = rsa.generate_crt_key(self.d, p, q)
+
+    @classmethod
+    def from_parameters(cls, n, e, d, p, q, dp, dq, qinv):
+        # all the parameters are already known (e.g. loaded from a keystore): nothing is recomputed
+        key = cls.__new__(cls)
+        key.n, key.e, key.d, key.p, key.q = n, e, d, p, q
+        key.dp, key.dq, key.qinv = dp, dq, qinv
+        return key
+
+    @classmethod
+    def generate(cls, k, sieve=True, method="miller_rabin"):
+        # k is the number of bits of each prime
+        p = rsa.generate_prime(k, sieve=sieve, method=method)
+        q = rsa.generate_prime(k, sieve=sieve, method=method)
+        while q == p:
+            q = rsa.generate_prime(k, sieve=sieve, method=method)
+        e, d, _ = rsa.generate_key(p, q)
+        return cls(p, q, e, d)
+
+    def public_key(self):
+        return RSAPublicKey(self.n, self.e)
+
+    def encrypt(self, m):
+        return pow(m, self.e, self.n)
+
+    def encrypt_many(self, messages):
+        n, e = self.n, self.e
+        return [pow(m, e, n) for m in messages]
+
+    def decrypt(self, c, crt=True):
+        if not crt:
+            return pow(c, self.d, self.n)
+        p, q = self.p, self.q
+        m1 = pow(c, self.dp, p)
+        m2 = pow(c, self.dq, q)
+        h = (self.qinv * (m1 - m2)) % p
+        return m2 + h * q
+
+    def decrypt_many(self, ciphertexts, crt=True):
+        if not crt:
+            d, n = self.d, self.n
+            return [pow(c, d, n) for c in ciphertexts]
+        # bind the key material to locals once for the whole batch
+        p, q, dp, dq, qinv = self.p, self.q, self.dp, self.dq, self.qinv
+        messages = []
+        for c in ciphertexts:
+            m2 = pow(c, dq, q)
+            messages.append(m2 + ((qinv * (pow(c, dp, p) - m2)) % p) * q)
+        return messages
+
+    def __repr__(self):
+        return f"RSAPrivateKey(n={self.n}, e={self.e})"
@@ -0,0 +1,149 @@
+import functools
+import json
+import queue
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import rsa
+import rsa_keys
+import primality
+from egcd import egcd
+
+# Batch mode: one JSON operation per line on stdin, one JSON result per line
+# on stdout, in the same order. A request is
+#   {"id": 1, "op": "modexp", "a": 2, "b": 10, "m": 1000}
+# and the answer is
+#   {"id": 1, "result": {"result": 24}}   or   {"id": 1, "error": "..."}
+# The operations and their parameters are the ones of the rsa.py commands, plus
+# rsa_decrypt_key that takes the key from a keystore ("keystore", "index") or
+# from "p", "q", "e". Integers can be JSON numbers or strings (decimal or 0x hex).
+# Parsed keys are cached, in every worker process when a pool is used.
+
+HEAVY_OPERATIONS = {"generate_prime", "generate_rsa_key", "rsa_decrypt", "rsa_decrypt_crt", "rsa_decrypt_key", "rsa_encrypt", "miller_rabin"}
+
+def to_int(value):
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+@functools.lru_cache(maxsize=64)
+def keystore_key(path, index):
+    import keystore
+    return keystore.load_key(path, index)
+
+@functools.lru_cache(maxsize=64)
+def primes_key(p, q, e):
+    return rsa_keys.RSAPrivateKey(p, q, e)
+
+def request_key(request):
+    if "keystore" in request:
+        return keystore_key(request["keystore"], to_int(request.get("index", 0)))
+    return primes_key(to_int(request["p"]), to_int(request["q"]), to_int(request["e"]))
+
+def run_operation(request):
+    op = request.get("op")
+    value = lambda name: to_int(request[name])
+    if op == "egcd":
+        gcd, x, y = egcd(value("a"), value("b"))
+        return {"gcd": gcd, "x": x, "y": y}
+    if op == "modexp":
+        return {"result": pow(value("a"), value("b"), value("m"))}
+    if op == "miller_rabin":
+        if request.get("deterministic"):
+            return {"is_prime": primality.is_prime(value("n"))}
+        return {"is_probably_prime": rsa.miller_rabin(value("n"), to_int(request.get("k", 5)))}
+    if op == "generate_prime":
+        stats = {}
+        method = "deterministic" if request.get("deterministic") else "miller_rabin"
+        if request.get("safe"):
+            prime = rsa.generate_safe_prime(value("k"), stats=stats, method=method)
+        else:
+            prime = rsa.generate_prime(value("k"), sieve=request.get("sieve", False), stats=stats, method=method)
+        return {"prime": prime, "sieved": stats["sieved"], "tested": stats["tested"]}
+    if op == "rsa_encrypt":
+        return {"ciphertext": rsa.rsa_encrypt(value("m"), value("e"), value("n"))}
+    if op == "rsa_decrypt":
+        return {"message": rsa.rsa_decrypt(value("c"), value("d"), value("n"))}
+    if op == "rsa_decrypt_crt":
+        return {"message": rsa.rsa_decrypt_crt(value("c"), value("p"), value("q"), value("dp"), value("dq"), value("qinv"))}
+    if op == "rsa_decrypt_key":
+        return {"message": request_key(request).decrypt(value("c"))}
+    if op == "generate_rsa_key":
+        e, d, n = rsa.generate_key(value("p"), value("q"))
+        return {"e": e, "d": d, "n": n}
+    if op == "generate_rsa_crt_keys":
+        dp, dq, qinv = rsa.generate_crt_key(value("d"), value("p"), value("q"))
+        return {"dp": dp, "dq": dq, "qinv": qinv}
+    raise ValueError(f"Unknown operation: {op}")
+
+def handle(request):
+    response = {"id": request.get("id")}
+    try:
+        response["result"] = run_operation(request)
+    except Exception as error:
+        # a bad request (missing keystore, index out of range, ...) only gets
+        # an error answer, the batch goes on with the next requests
+        response["error"] = f"{type(error).__name__}: {error}"
+    return response
+
+def parse_line(line):
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("a request must be a JSON object")
+        return request, None
+    except ValueError as error:
+        return None, {"id": None, "error": f"Invalid request: {error}"}
+
+def serve(input_stream=sys.stdin, output_stream=sys.stdout, workers=0):
+    # workers = 0: every operation runs in this process. Otherwise the heavy
+    # operations go to a pool and at most 4 * workers requests are in flight.
+    def write(response):
+        output_stream.write(json.dumps(response) + "\n")
+        output_stream.flush()
+
+    if not workers:
+        for line in input_stream:
+            if line.strip():
+                request, error = parse_line(line)
+                write(error or handle(request))
+        return
+
+    # the answers are written by a separate thread, in request order, as soon as
+    # they are ready: a client can wait for an answer before sending the next line
+    answers = queue.Queue(maxsize=4 * workers)
+
+    def writer():
+        while True:
+            item = answers.get()
+            if item is None:
+                return
+            if not isinstance(item, dict):
+                request_id, future = item
+                try:
+                    item = future.result()
+                except Exception as error:
+                    # the worker failed (e.g. BrokenProcessPool): still one answer per request
+                    item = {"id": request_id, "error": f"{type(error).__name__}: {error}"}
+            write(item)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        writer_thread = threading.Thread(target=writer)
+        writer_thread.start()
+        try:
+            for line in input_stream:
+                if not line.strip():
+                    continue
+                request, error = parse_line(line)
+                if error is not None:
+                    answers.put(error)
+                elif request.get("op") in HEAVY_OPERATIONS:
+                    try:
+                        answers.put((request.get("id"), executor.submit(handle, request)))
+                    except Exception as error:
+                        # the pool is broken: submit raises instead of returning a future
+                        answers.put({"id": request.get("id"), "error": f"{type(error).__name__}: {error}"})
+                else:
+                    answers.put(handle(request))
+        finally:
+            answers.put(None)
+            writer_thread.join()
@@ -0,0 +1,342 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import keystore
+import rsa
+import rsa_batch
+
+# Decryption service: many clients send ciphertexts over a local socket, the
+# server puts them in a queue and coalesces them into micro-batches that are
+# decrypted (CRT) by a pool of worker processes holding the key.
+# A batch is dispatched when it has batch_size ciphertexts or when its first
+# ciphertext has waited max_wait seconds, whichever comes first.
+# Protocol: one JSON object per line, the answers carry the id of the request
+# and can come back in any order, so a client may pipeline its requests.
+#   {"id": 1, "op": "decrypt", "c": 1234}  ->  {"id": 1, "message": 5678}
+#   {"id": 2, "op": "stats"}               ->  {"id": 2, "stats": {...}}
+
+# upper bounds (ms) of the latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def add(self, milliseconds):
+        i = 0
+        while i < len(self.buckets) and milliseconds > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += milliseconds
+
+    def as_dict(self):
+        labels = [f"<={bucket}" for bucket in self.buckets] + [f">{self.buckets[-1]}"]
+        count = sum(self.counts)
+        return {
+            "count": count,
+            "mean_ms": self.total / count if count else 0.0,
+            "buckets_ms": dict(zip(labels, self.counts)),
+        }
+
+
+def parse_ciphertext(value, n):
+    # the "c" of a request: an integer or a decimal / 0x hexadecimal string, in [0, n)
+    if isinstance(value, str):
+        c = int(value, 0)
+    elif isinstance(value, int) and not isinstance(value, bool):
+        c = value
+    else:
+        raise TypeError(f"The ciphertext must be an integer, not {type(value).__name__}")
+    if not 0 <= c < n:
+        raise ValueError("The ciphertext must be in [0, n)")
+    return c
+
+class DecryptionService:
+    def __init__(self, key, workers=None, batch_size=64, max_wait=0.002):
+        self.key = key
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        # no more batches in flight than workers: while they are all busy the
+        # requests wait in the queue and the next batch gets bigger
+        self.slots = asyncio.Semaphore(self.workers)
+        self.executor = None
+        self.batcher = None
+        # the event loop keeps only weak references to tasks: the running batches are kept here
+        self.batch_tasks = set()
+        self.in_flight = 0
+        self.nr_batches = 0
+        self.nr_decrypted = 0
+        self.queue_latency = LatencyHistogram()
+        self.total_latency = LatencyHistogram()
+
+    async def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=rsa_batch.init_worker, initargs=(self.key,))
+        self.batcher = asyncio.create_task(self._batch_loop())
+
+    async def close(self):
+        self.batcher.cancel()
+        try:
+            await self.batcher
+        except asyncio.CancelledError:
+            pass
+        self.executor.shutdown()
+
+    async def decrypt(self, c):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((c, future, time.perf_counter()))
+        return await future
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batch_loop(self):
+        while True:
+            await self.slots.acquire()
+            batch = await self._next_batch()
+            task = asyncio.create_task(self._run_batch(batch))
+            self.batch_tasks.add(task)
+            task.add_done_callback(self.batch_tasks.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        dispatched = time.perf_counter()
+        for _, _, queued in batch:
+            self.queue_latency.add((dispatched - queued) * 1000)
+        self.in_flight += len(batch)
+        try:
+            messages = await loop.run_in_executor(self.executor, rsa_batch.decrypt_chunk, [c for c, _, _ in batch])
+        except Exception as error:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        finally:
+            self.in_flight -= len(batch)
+            self.slots.release()
+        done = time.perf_counter()
+        self.nr_batches += 1
+        self.nr_decrypted += len(batch)
+        for (_, future, queued), m in zip(batch, messages):
+            self.total_latency.add((done - queued) * 1000)
+            if not future.done():
+                future.set_result(m)
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "in_flight": self.in_flight,
+            "batches": self.nr_batches,
+            "decrypted": self.nr_decrypted,
+            "mean_batch_size": self.nr_decrypted / self.nr_batches if self.nr_batches else 0.0,
+            "queue_latency": self.queue_latency.as_dict(),
+            "total_latency": self.total_latency.as_dict(),
+        }
+
+    async def _answer(self, request, writer):
+        response = {"id": request.get("id")}
+        try:
+            if request.get("op") == "decrypt":
+                response["message"] = await self.decrypt(parse_ciphertext(request["c"], self.key.n))
+            elif request.get("op") == "stats":
+                response["stats"] = self.stats()
+            else:
+                raise ValueError(f"Unknown operation: {request.get('op')}")
+        except Exception as error:
+            # bad requests and failed batches (e.g. a broken pool) get an error answer
+            response["error"] = f"{type(error).__name__}: {error}"
+        writer.write((json.dumps(response) + "\n").encode())
+
+    async def handle_client(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request must be a JSON object")
+                except ValueError as error:
+                    writer.write((json.dumps({"id": None, "error": f"Invalid request: {error}"}) + "\n").encode())
+                    continue
+                task = asyncio.create_task(self._answer(request, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def open_connection(unix=None, host="127.0.0.1", port=8765):
+    if unix is not None:
+        return await asyncio.open_unix_connection(unix)
+    return await asyncio.open_connection(host, port)
+
+async def serve(key, unix=None, host="127.0.0.1", port=8765, workers=None, batch_size=64, max_wait=0.002):
+    service = DecryptionService(key, workers, batch_size, max_wait)
+    await service.start()
+    if unix is not None:
+        server = await asyncio.start_unix_server(service.handle_client, path=unix)
+        address = unix
+    else:
+        server = await asyncio.start_server(service.handle_client, host, port)
+        address = f"{host}:{port}"
+    print(f"Serving on {address}: {service.workers} workers, batches of up to {batch_size}, max wait {max_wait * 1000:g} ms", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+async def _load_client(reader, writer, ciphertexts, latencies, deadline):
+    # closed loop: a new request is sent when the answer to the previous one arrives
+    i = 0
+    while time.perf_counter() < deadline:
+        c, expected = ciphertexts[i % len(ciphertexts)]
+        start = time.perf_counter()
+        writer.write((json.dumps({"id": i, "op": "decrypt", "c": c}) + "\n").encode())
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        if response.get("message") != expected:
+            raise ValueError(f"Wrong answer from the server: {response}")
+        i += 1
+
+async def _server_stats(reader, writer):
+    writer.write((json.dumps({"id": "stats", "op": "stats"}) + "\n").encode())
+    return json.loads(await reader.readline())["stats"]
+
+async def loadgen(public_key, unix=None, host="127.0.0.1", port=8765, clients=32, duration=5.0, nr_messages=256):
+    messages = [random.randint(2, public_key.n - 1) for _ in range(nr_messages)]
+    ciphertexts = list(zip(public_key.encrypt_many(messages), messages))
+    connections = [await open_connection(unix, host, port) for _ in range(clients)]
+    before = await _server_stats(*connections[0])
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_load_client(reader, writer, ciphertexts, latencies, start + duration) for reader, writer in connections))
+    elapsed = time.perf_counter() - start
+
+    stats = await _server_stats(*connections[0])
+    for _, writer in connections:
+        writer.close()
+
+    latencies.sort()
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": rsa.percentile(latencies, 50) * 1000,
+        "p99_ms": rsa.percentile(latencies, 99) * 1000,
+        "batches": stats["batches"] - before["batches"],
+        "mean_batch_size": (stats["decrypted"] - before["decrypted"]) / max(stats["batches"] - before["batches"], 1),
+        "server": stats,
+    }
+
+def display_load(result):
+    print(f"{'Clients':<30}{result['clients']}")
+    print(f"{'Requests':<30}{result['requests']}")
+    print(f"{'Throughput (req/s)':<30}{result['throughput']:.1f}")
+    print(f"{'p50 latency (ms)':<30}{result['p50_ms']:.3f}")
+    print(f"{'p99 latency (ms)':<30}{result['p99_ms']:.3f}")
+    print(f"{'Batches':<30}{result['batches']}")
+    print(f"{'Mean batch size':<30}{result['mean_batch_size']:.1f}")
+    server = result["server"]
+    print(f"{'Server queue depth':<30}{server['queue_depth']}")
+    # the histogram counts every request since the server started
+    print(f"{'Server latency histogram':<30}{server['total_latency']['buckets_ms']}")
+    print()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="""Asyncio RSA decryption service with request coalescing
+
+Commands:
+  serve               Decrypt (CRT) the ciphertexts sent by the clients, in micro-batches
+                      Parameters:
+                        --keystore: Keystore file with the private key
+                        --index: Index of the key in the keystore (default: 0)
+                        --unix: Unix socket path (default: TCP on --host and --port)
+                        --host, --port: TCP address (default: 127.0.0.1:8765)
+                        --workers: Number of worker processes (default: number of cores)
+                        --batch-size: Maximum number of ciphertexts in a batch (default: 64)
+                        --max-wait: Maximum time (ms) a ciphertext waits for its batch to fill (default: 2)
+                      Example: python3 rsa_service.py serve --keystore keys.bin --unix /tmp/rsa.sock
+
+  loadgen             Closed-loop load generator: every client sends a ciphertext and waits for the answer
+                      Parameters:
+                        --keystore, --index: Keystore with the public key of the server
+                        --unix, --host, --port: Address of the server
+                        -c: Number of concurrent clients, one or more values (default: 1 8 32)
+                        -t: Duration (seconds) of every run (default: 5)
+                      Output: throughput, p50 and p99 latency, server batch size and latency histogram
+                      Example: python3 rsa_service.py loadgen --keystore keys.bin --unix /tmp/rsa.sock -c 1 16 64
+""",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    def add_address(subparser):
+        subparser.add_argument("--keystore", type=str, required=True, help="Keystore file")
+        subparser.add_argument("--index", type=int, default=0, help="Index of the key in the keystore")
+        subparser.add_argument("--unix", type=str, default=None, help="Unix socket path")
+        subparser.add_argument("--host", type=str, default="127.0.0.1", help="TCP host")
+        subparser.add_argument("--port", type=int, default=8765, help="TCP port")
+
+    parser_serve = subparsers.add_parser("serve", help="Run the decryption service")
+    add_address(parser_serve)
+    parser_serve.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser_serve.add_argument("--batch-size", type=int, default=64, help="Maximum batch size")
+    parser_serve.add_argument("--max-wait", type=float, default=2, help="Maximum batch wait (ms)")
+
+    parser_loadgen = subparsers.add_parser("loadgen", help="Measure latency against throughput")
+    add_address(parser_loadgen)
+    parser_loadgen.add_argument("-c", type=int, nargs="+", default=[1, 8, 32], help="Number of concurrent clients")
+    parser_loadgen.add_argument("-t", type=float, default=5, help="Duration of every run (seconds)")
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+    elif args.command == "serve":
+        key = keystore.load_key(args.keystore, args.index)
+        try:
+            asyncio.run(serve(key, args.unix, args.host, args.port, args.workers, args.batch_size, args.max_wait / 1000))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "loadgen":
+        with keystore.KeyStore(args.keystore) as store:
+            public_key = store.public_key(args.index)
+        for clients in args.c:
+            display_load(asyncio.run(loadgen(public_key, args.unix, args.host, args.port, clients, args.t)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+
+import rsa_batch
+
+# File encryption with RSA, one block at a time.
+# Every plaintext block has at most k - 11 bytes (k = size of n in bytes) and is
+# padded as in PKCS#1 v1.5 (encryption block type 2):
+#   00 02 | at least 8 random non-zero bytes | 00 | data
+# Every ciphertext block has exactly k bytes. The blocks are read, sent to the
+# worker pool and written back one batch at a time, so memory does not depend
+# on the size of the file.
+
+PADDING_OVERHEAD = 11
+
+def modulus_bytes(n):
+    return (n.bit_length() + 7) // 8
+
+def pad(data, k):
+    padding_length = k - 3 - len(data)
+    if padding_length < 8:
+        raise ValueError("Data too long for the modulus")
+    padding = bytearray(os.urandom(padding_length))
+    for i, byte in enumerate(padding):
+        while byte == 0:
+            byte = os.urandom(1)[0]
+        padding[i] = byte
+    return b'\x00\x02' + bytes(padding) + b'\x00' + data
+
+def unpad(block):
+    if len(block) < PADDING_OVERHEAD or block[0] != 0 or block[1] != 2:
+        raise ValueError("Decryption error: invalid padding")
+    separator = block.find(b'\x00', 2)
+    if separator < 10:
+        raise ValueError("Decryption error: invalid padding")
+    return block[separator + 1:]
+
+def read_blocks(file, size):
+    while True:
+        block = file.read(size)
+        if not block:
+            return
+        yield block
+
+def encrypt_stream(key, input_file, output_file, workers=None, chunk_size=256):
+    # returns the number of plaintext bytes read
+    k = modulus_bytes(key.n)
+    total = 0
+    def messages():
+        nonlocal total
+        for block in read_blocks(input_file, k - PADDING_OVERHEAD):
+            total += len(block)
+            yield int.from_bytes(pad(block, k), 'big')
+    for c in rsa_batch.encrypt_batch(key, messages(), workers, chunk_size):
+        output_file.write(c.to_bytes(k, 'big'))
+    return total
+
+def decrypt_stream(key, input_file, output_file, workers=None, chunk_size=256):
+    # returns the number of plaintext bytes written, as encrypt_stream counts
+    # the plaintext bytes read: the two throughputs can be compared
+    k = modulus_bytes(key.n)
+    def ciphertexts():
+        for block in read_blocks(input_file, k):
+            if len(block) != k:
+                raise ValueError("Truncated ciphertext block")
+            yield int.from_bytes(block, 'big')
+    total = 0
+    for m in rsa_batch.decrypt_batch(key, ciphertexts(), workers, chunk_size):
+        block = unpad(m.to_bytes(k, 'big'))
+        output_file.write(block)
+        total += len(block)
+    return total
+
+def encrypt_file(key, input_path, output_path, workers=None, chunk_size=256):
+    with open(input_path, 'rb') as input_file, open(output_path, 'wb') as output_file:
+        return encrypt_stream(key, input_file, output_file, workers, chunk_size)
+
+def decrypt_file(key, input_path, output_path, workers=None, chunk_size=256):
+    with open(input_path, 'rb') as input_file, open(output_path, 'wb') as output_file:
+        return decrypt_stream(key, input_file, output_file, workers, chunk_size)
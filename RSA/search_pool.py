@@ -0,0 +1,67 @@
+import os
+import random
+
+# Pool of worker processes racing on the same search (prime generation,
+# factoring): every worker runs its own search loop with independent random
+# choices, the first useful result sets the shared stop event and the other
+# workers give up at their next check of the event.
+# multiprocessing and concurrent.futures are imported by SearchPool itself, the
+# modules that use it do not pay for them at startup.
+
+# the stop event of the pool, in every worker process
+_stop_event = None
+
+def _init_search_worker(stop_event):
+    global _stop_event
+    _stop_event = stop_event
+    # forked workers inherit the parent's random state, reseed them from the OS
+    # so that each worker explores an independent stream of candidates
+    random.seed(os.urandom(32))
+
+def worker_stop_event():
+    # in a worker: the event set when the search is over
+    return _stop_event
+
+class SearchPool:
+    def __init__(self, workers=None):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        self.workers = workers or os.cpu_count() or 1
+        self.stop_event = multiprocessing.Event()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_search_worker, initargs=(self.stop_event,))
+
+    def submit(self, function, *args):
+        return self.executor.submit(function, *args)
+
+    def first_result(self, start, on_done):
+        # start() submits the first searches and returns their futures,
+        # on_done(future, pending) returns the result of a finished search or None
+        # (it may add new searches to pending). Returns the first result that is
+        # not None and the searches still running when it was found: they are
+        # cancelled or, if already running, finished (they stop at their next
+        # check of the event)
+        from concurrent.futures import FIRST_COMPLETED, wait
+        self.stop_event.clear()
+        pending = set(start())
+        result = None
+        while result is None and pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                value = on_done(future, pending)
+                if result is None:
+                    result = value
+        self.stop_event.set()
+        for future in pending:
+            future.cancel()
+        wait(pending)
+        return result, pending
+
+    def close(self):
+        self.stop_event.set()
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
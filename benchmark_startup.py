@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Cold-start latency of the command line tools: every command runs in a new
+# interpreter with -X importtime, the report has the wall time of the process,
+# the total import time (sum of the top-level imports) and the heaviest imports.
+# The results can be saved and compared with a previous run.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# (name, directory, arguments)
+COMMANDS = [
+    ("HillCipher encrypt", "HillCipher", ["HillCipher.py", "--mode", "encrypt", "--message", "HELP", "--key", "7,4;11,11"]),
+    ("HillCipher decrypt", "HillCipher", ["HillCipher.py", "--mode", "decrypt", "--message", "TQXX", "--key", "7,4;11,11"]),
+    ("FrequencyAnalysis coincidence", "FrequencyAnalysis", ["FrequencyAnalysis.py", "1st_chap.txt", "--coincidence-entropy", "2"]),
+    ("huffman demo", "Huffman", ["huffman.py", "demo"]),
+    ("lempel_ziv demo", "Huffman", ["lempel_ziv.py", "demo"]),
+    ("rsa egcd", "RSA", ["rsa.py", "egcd", "-a", "240", "-b", "46"]),
+    ("rsa modexp", "RSA", ["rsa.py", "modexp", "-a", "2", "-b", "10", "-m", "1000"]),
+    ("rsa miller_rabin", "RSA", ["rsa.py", "miller_rabin", "-n", "97", "--deterministic"]),
+    ("rsa rsa_encrypt", "RSA", ["rsa.py", "rsa_encrypt", "-m", "42", "-e", "17", "-n", "3233"]),
+    ("rsa generate_rsa_key", "RSA", ["rsa.py", "generate_rsa_key", "-p", "61", "-q", "53"]),
+]
+
+def parse_importtime(stderr):
+    # lines "import time: self [us] | cumulative | name", the name of a top-level
+    # import is indented by one space, nested imports by two more per level
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2]
+        if len(name) - len(name.lstrip()) == 1:
+            imports.append((name.strip(), int(fields[1])))
+    return imports
+
+def run_command(directory, arguments):
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime"] + arguments, cwd=os.path.join(ROOT, directory), capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    return process.returncode, wall, parse_importtime(process.stderr)
+
+def measure(directory, arguments, repeats):
+    walls = []
+    import_times = []
+    heaviest = {}
+    for _ in range(repeats):
+        returncode, wall, imports = run_command(directory, arguments)
+        if returncode != 0:
+            return None
+        walls.append(wall * 1000)
+        import_times.append(sum(cumulative for _, cumulative in imports) / 1000)
+        for name, cumulative in imports:
+            heaviest[name] = max(heaviest.get(name, 0), cumulative / 1000)
+    top = sorted(heaviest.items(), key=lambda item: item[1], reverse=True)[:3]
+    return {
+        "wall_ms": statistics.median(walls),
+        "import_ms": statistics.median(import_times),
+        "heaviest": [f"{name} {ms:.1f}" for name, ms in top],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start latency of every command line tool, with -X importtime")
+    parser.add_argument("-r", type=int, default=5, help="Number of runs of every command, the median is reported (default: 5)")
+    parser.add_argument("--filter", type=str, default=None, help="Only the commands whose name contains this string")
+    parser.add_argument("-o", type=str, default=None, help="Save the results to this JSON file")
+    parser.add_argument("--baseline", type=str, default=None, help="JSON file of a previous run to compare with")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+
+    print(f"{'Command':<32}{'Wall (ms)':<12}{'Imports (ms)':<14}{'vs baseline':<14}{'Heaviest imports (ms)'}")
+    print("-" * 110)
+    results = {}
+    for name, directory, arguments in COMMANDS:
+        if args.filter is not None and args.filter not in name:
+            continue
+        result = measure(directory, arguments, args.r)
+        if result is None:
+            # usually a missing optional dependency
+            print(f"{name:<32}failed")
+            continue
+        results[name] = result
+        delta = ""
+        if name in baseline:
+            delta = f"{result['wall_ms'] - baseline[name]['wall_ms']:+.1f}"
+        print(f"{name:<32}{result['wall_ms']:<12.1f}{result['import_ms']:<14.1f}{delta:<14}{', '.join(result['heaviest'])}")
+
+    if args.o is not None:
+        with open(args.o, 'w') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()